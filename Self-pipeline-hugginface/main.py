@@ -1,37 +1,257 @@
+import argparse
 import os
 from pathlib import Path
-from pipeline.data_reader import read_csv
-from pipeline.preprocessor import clean_text
-from pipeline.analyzer import SentimentAnalyzer
+from pipeline.data_reader import read_csv_chunks, read_input_chunks
+from pipeline.exceptions import DataReadError
+from pipeline.preprocessor import PREPROCESSING_VERSION, clean_texts
+from pipeline.analyzer import MODEL_NAME, SentimentAnalyzer
+from pipeline.parallel import ShardedAnalyzer
 from pipeline.pipeline import Pipeline
+from sentiment_common.backends import BACKENDS, backend_model_id
+from sentiment_common.language import LanguageDetector
+from sentiment_common.near_duplicates import NearDuplicateIndex
+from sentiment_common.checkpoint import Checkpoint
+from sentiment_common.result_cache import ResultCache
+from sentiment_common.startup import startup_timer
+from sentiment_common.token_cache import open_token_cache
+from sentiment_common.tuning import describe_tuned, load_tuned_settings, resolve_settings, set_torch_threads
+from sentiment_common.windowing import LONG_DOCUMENT_MODES
+from sentiment_common.writers import StreamingCsvWriter
+
+# Columns the whole-chunk stages add to the output, after the input's own
+OUTPUT_COLUMNS = ('language', 'cluster_id', 'sentiment')
+
+def fold_near_duplicates(df, index):
+    texts, clusters = index.canonicalize(df['text'])
+    return df.assign(text=texts, cluster_id=clusters)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run sentiment analysis over a feedback file")
+    parser.add_argument("--input", default="data/input/sample_feedback.csv",
+                        help="input file: CSV, Parquet, Arrow IPC (.arrow/.feather) or JSONL, by extension")
+    parser.add_argument("--id-column", default="id",
+                        help="column kept alongside 'text' from Parquet/Arrow/JSONL input, when present")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue a crashed run from its checkpoint instead of starting over")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="input rows processed, written and checkpointed together")
+    parser.add_argument("--streaming", action="store_true",
+                        help="run reading, cleaning and analysis concurrently on consecutive chunks")
+    parser.add_argument("--queue-size", type=int, default=2,
+                        help="chunks buffered between streaming stages (bounds memory)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes; above 1 the input is split into shards analyzed in parallel "
+                             "(default: this host's tuned profile, else 1)")
+    parser.add_argument("--shard-size", type=int, default=256,
+                        help="texts per shard handed to a worker")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per worker (default: tuned profile, else cores / workers)")
+    parser.add_argument("--max-batch-tokens", type=int, default=None,
+                        help="padded tokens per model batch; texts are batched by similar length "
+                             "(default: tuned profile, else 4096)")
+    parser.add_argument("--no-tuned-profile", action="store_true",
+                        help="ignore the settings python -m sentiment_common.tuning saved for this host")
+    parser.add_argument("--tuning-dir", default=None,
+                        help="load the tuned profile from this directory (as given to sentiment_common.tuning)")
+    parser.add_argument("--max-length", type=int, default=512,
+                        help="most tokens per model input, e.g. 128 for tweet-length data")
+    parser.add_argument("--long-documents", choices=LONG_DOCUMENT_MODES, default="truncate",
+                        help="texts over --max-length: keep their first tokens, or score overlapping windows "
+                             "(batched across texts) and average them")
+    parser.add_argument("--max-windows", type=int, default=None,
+                        help="with --long-documents window, most windows per text, evenly spread (caps per-row cost)")
+    parser.add_argument("--route-languages", action="store_true",
+                        help="detect each row's language (offline) and score non-English rows with the "
+                             "multilingual model instead; English and undetermined rows stay on the default model")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=None,
+                        help="cluster near-identical cleaned texts (MinHash/LSH, estimated Jaccard similarity at "
+                             "least this) and score one per cluster; adds a cluster_id column")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="CPU inference backend: float32 torch, int8-quantized torch, ONNX Runtime, or a no-model stub")
+    parser.add_argument("--cache-size", type=int, default=100_000,
+                        help="entries kept in the in-memory result cache (0 disables caching)")
+    parser.add_argument("--cache-db", default=None,
+                        help="SQLite file that keeps cached results between runs")
+    parser.add_argument("--token-cache", default=None,
+                        help="directory of pre-tokenized inputs; the input is tokenized once into it and "
+                             "later runs feed the cached token ids straight to the model")
+    parser.add_argument("--profile-report", default=None,
+                        help="write per-stage wall/CPU time, items and items/sec as JSON to this file")
+    parser.add_argument("--profile-dir", default=None,
+                        help="also save cProfile output per stage (and torch profiler op tables for analyze) here")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long imports, tokenizer load, weight load and first inference took")
+    args = parser.parse_args()
+    if args.token_cache and args.workers is not None and args.workers > 1:
+        parser.error("--token-cache runs in a single process; drop --workers")
+    # Settings not given on the command line come from this host's tuned profile, if it has one
+    tuned = None if args.no_tuned_profile else load_tuned_settings(MODEL_NAME, args.backend, args.tuning_dir)
+    if tuned is not None and args.token_cache:
+        tuned = {name: value for name, value in tuned.items() if name not in ('workers', 'threads_per_worker')}
+    settings = resolve_settings(vars(args), tuned,
+                                {'workers': 1, 'threads_per_worker': None, 'max_batch_tokens': 4096})
+    vars(args).update(settings)
+    if tuned is not None:
+        print(describe_tuned(tuned, [name for name in settings if name in tuned]))
+    if args.token_cache and args.long_documents == 'window':
+        parser.error("--token-cache stores truncated inputs; it can't be combined with --long-documents window")
+    if args.token_cache and args.route_languages:
+        parser.error("--token-cache holds one tokenizer's ids; it can't be combined with --route-languages")
+    if args.token_cache and args.near_duplicate_threshold is not None:
+        parser.error("--token-cache scores rows by position; it can't be combined with --near-duplicate-threshold")
+    if args.near_duplicate_threshold is not None and not 0 < args.near_duplicate_threshold <= 1:
+        parser.error("--near-duplicate-threshold must be in (0, 1]")
+    if args.resume and args.near_duplicate_threshold is not None:
+        # The clusters aren't checkpointed, so resumed rows would reuse cluster ids already written
+        parser.error("--resume can't restore near-duplicate clusters; rerun with --near-duplicate-threshold "
+                     "from the start")
+    return args
 
 def main():
+    args = parse_args()
+
     # Setup paths
-    input_path = Path("data/input/sample_feedback.csv")
+    input_path = Path(args.input)
     output_dir = Path("data/output")
     output_dir.mkdir(exist_ok=True)
+    output_path = output_dir / "results.csv"
+
+    # Pick up where a crashed run stopped, if asked to and a checkpoint exists
+    checkpoint = Checkpoint(f"{output_path}.ckpt.json", input_path)
+    state = checkpoint.load() if args.resume else None
+    if state is not None:
+        print(f"Resuming after {state['input_offset']} already scored rows")
+    else:
+        checkpoint.clear()
+    start_row = state['input_offset'] if state is not None else 0
     
-    # Initialize pipeline components
-    analyzer = SentimentAnalyzer()
-    
-    # Build pipeline
-    pipeline = Pipeline()
-    pipeline.add_stage(lambda _: read_csv(input_path))
-    pipeline.add_stage(lambda df: df['text'].apply(clean_text))
-    pipeline.add_stage(lambda texts: [analyzer.analyze(text) for text in texts])
+    # Duplicate feedback is scored once; the cache is keyed on the cleaned text
+    model_id = backend_model_id(MODEL_NAME, args.backend)
+    if (args.max_length, args.long_documents) != (512, 'truncate'):
+        # Long texts score differently when cut differently, so their results are kept apart
+        model_id += f"|{args.long_documents}:{args.max_length}:{args.max_windows}"
+    cache = None
+    if args.cache_size > 0:
+        cache = ResultCache(model_id, args.cache_size, args.cache_db)
+
+    # Near-duplicate clusters persist across chunks, so a template seen early is scored only once
+    near_duplicates = None
+    if args.near_duplicate_threshold is not None:
+        near_duplicates = NearDuplicateIndex(args.near_duplicate_threshold)
+
+    # Build pipeline; it runs on one chunk of the input at a time
+    pipeline = Pipeline(profile_dir=args.profile_dir)
+    if args.workers > 1:
+        # Each worker process builds its own analyzer once and keeps it for every chunk
+        analyzer = ShardedAnalyzer(args.workers, args.shard_size, args.threads_per_worker,
+                                   cache, args.max_batch_tokens, args.backend,
+                                   args.max_length, args.long_documents, args.max_windows, args.route_languages)
+    else:
+        # In a single process, the whole thread budget goes to this process's model
+        set_torch_threads(args.threads_per_worker)
+        analyzer = SentimentAnalyzer(cache, args.max_batch_tokens, backend=args.backend, max_length=args.max_length,
+                                     long_documents=args.long_documents, max_windows=args.max_windows,
+                                     route_languages=args.route_languages)
+    if args.token_cache:
+        # Cleaning and tokenizing happen once, when the cache is built; each chunk's rows are
+        # then looked up by their position in the input file (the chunk's index)
+        with pipeline.profiler.stage('token_cache'):
+            token_cache = open_token_cache(
+                args.token_cache, input_path, backend_model_id(MODEL_NAME, args.backend), PREPROCESSING_VERSION,
+                lambda: (clean_texts(chunk['text'])
+                         for chunk in read_input_chunks(input_path, args.chunk_size, id_column=args.id_column)),
+                lambda: analyzer.classifier.tokenizer, args.max_length)
+        pipeline.add_stage(lambda df: analyzer.analyze_token_rows(token_cache, df.index),
+                           name='analyze', torch_profile=True)
+    elif args.route_languages or near_duplicates is not None:
+        # These stages pass the whole chunk along, so the language and cluster of each row reach the output
+        if args.route_languages:
+            # Languages are detected on the raw text; rows leaving the default model keep their non-ASCII letters
+            detector = LanguageDetector()
+            pipeline.add_stage(lambda df: df.assign(language=detector.detect_many(df['text'])),
+                               name='detect_language')
+            pipeline.add_stage(lambda df: df.assign(text=clean_texts(
+                df['text'], [analyzer.router.model_for(language) != MODEL_NAME for language in df['language']])),
+                name='clean_texts')
+        else:
+            pipeline.add_stage(lambda df: df.assign(text=clean_texts(df['text'])), name='clean_texts')
+        if near_duplicates is not None:
+            # Members take their representative's text, so the analyzer scores each cluster once
+            pipeline.add_stage(lambda df: fold_near_duplicates(df, near_duplicates), name='near_duplicates')
+        pipeline.add_stage(lambda df: df.assign(sentiment=analyzer.analyze_batch(df['text'], df.get('language'))),
+                           name='analyze', torch_profile=True)
+    else:
+        pipeline.add_stage(lambda df: clean_texts(df['text']), name='clean_texts')
+        pipeline.add_stage(analyzer.analyze_batch, name='analyze', torch_profile=True)
+
+    # Each chunk is flushed to results.csv.part and checkpointed once it has been scored
+    writer = StreamingCsvWriter(
+        output_path, flush_rows=args.chunk_size,
+        on_flush=lambda w: checkpoint.save(w.rows_written, w.rows_written, w.bytes_written),
+        resume_rows=start_row,
+        resume_bytes=state['output_bytes'] if state is not None else None,
+    )
     
     # Execute pipeline
-    results = pipeline.run(None)
+    completed = True
+    try:
+        # Reading and writing happen around the pipeline stages, so they are timed into its report here
+        chunks = pipeline.profiler.timed_iter(
+            'read_input', read_input_chunks(input_path, args.chunk_size, start_row, args.id_column))
+        if args.streaming:
+            # Chunk k+1 is read and cleaned while chunk k is analyzed; results still arrive in order
+            outputs = pipeline.run_streaming(chunks, args.queue_size)
+        else:
+            outputs = ((chunk, pipeline.run(chunk)) for chunk in chunks)
+        for chunk, results in outputs:
+            if results is None:
+                completed = False
+                break
+            if hasattr(results, 'columns'):
+                # Whole-chunk stages: keep the raw text, add what the stages found out about each row
+                chunk = chunk.assign(**{column: results[column].to_numpy() for column in OUTPUT_COLUMNS
+                                        if column in results.columns})
+            else:
+                chunk = chunk.assign(sentiment=results)
+            with pipeline.profiler.stage('write', len(chunk)):
+                writer.write_frame(chunk)
+    except DataReadError as e:
+        print(f"Pipeline Error: {str(e)}")
+        completed = False
+    finally:
+        if isinstance(analyzer, ShardedAnalyzer):
+            analyzer.close()
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Result cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+              f"{stats['misses']} misses, {stats['hit_rate']:.1%} hit rate")
+        cache.close()
+
+    if args.route_languages:
+        print(analyzer.router.format_report())
+    if near_duplicates is not None:
+        print(near_duplicates.format_report())
+
+    if args.profile_report:
+        pipeline.write_report(args.profile_report)
+        print(f"Stage report saved to {args.profile_report}")
+
+    # With --workers > 1 the model is loaded in the worker processes, which time their own startup
+    if args.startup_report:
+        print(startup_timer.format_report())
     
     # Save and display results
-    if results is not None:
-        df = read_csv(input_path)
-        df['sentiment'] = results
-        output_path = output_dir / "results.csv"
-        df.to_csv(output_path, index=False)
+    if completed:
+        writer.close()
+        checkpoint.clear()
         print(f"\nResults saved to {output_path}")
         print("\nSample results:")
-        print(df[['text', 'sentiment']].head().to_string(index=False))
+        df = next(read_csv_chunks(output_path, 5))
+        print(df[['text', 'sentiment']].to_string(index=False))
+    else:
+        writer.flush()
+        print(f"\nPartial results kept in {writer.part_path}; rerun with --resume to continue")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
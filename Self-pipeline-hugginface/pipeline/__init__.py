@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Make the shared sentiment_common package at the repository root importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
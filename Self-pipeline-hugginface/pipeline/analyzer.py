@@ -1,22 +1,145 @@
-from transformers import pipeline
+from functools import partial
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence
+from sentiment_common.batching import token_budget_batches
+from sentiment_common.backends import token_probabilities
+from sentiment_common.postprocessing import ScoredBatch, map_labels
+from sentiment_common.language import LanguageRouter
+from sentiment_common.registry import MULTILINGUAL_STARS, TWITTER_ROBERTA_LATEST, model_spec, shared_pipeline
+from sentiment_common.startup import LazyModel
+from sentiment_common.windowing import WindowedClassifier
 from .exceptions import AnalysisError
 
+MODEL_NAME = TWITTER_ROBERTA_LATEST  # Its label map is declared in sentiment_common.registry
+# With language routing: English (and undetermined) rows stay on MODEL_NAME, every other language goes here
+MULTILINGUAL_MODEL_NAME = MULTILINGUAL_STARS
+
+def language_router() -> LanguageRouter:
+    return LanguageRouter({'en': MODEL_NAME, '*': MULTILINGUAL_MODEL_NAME}, default=MODEL_NAME)
+
+def cache_key(text: str, model_id: str) -> str:
+    # Cleaned texts never contain newlines, so this can't collide with a plain text key
+    return text if model_id == MODEL_NAME else f"{model_id}\n{text}"
+
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, cache=None, max_batch_tokens: int = 4096, max_batch_size: int = 64,
+                 backend: str = 'torch', max_length: int = 512, long_documents: str = 'truncate',
+                 max_windows: int = None, route_languages: bool = False):
+        # Optional sentiment_common.result_cache.ResultCache consulted before the model
+        self.cache = cache
+        # transformers is imported and the model built on the first call to load()/analyze*(),
+        # so constructing an analyzer (or running --help) costs nothing
+        # backend is one of sentiment_common.backends.BACKENDS ('torch', 'int8' or 'onnx')
+        self.backend = backend
+        # The weights come from the process-wide registry, shared with any other analyzer in the process
+        self.classifier = LazyModel(partial(shared_pipeline, MODEL_NAME, backend))
+        # No model input is longer than max_length tokens: longer texts are truncated, or with
+        # long_documents='window' scored as overlapping windows (at most max_windows) whose scores are
+        # averaged. Windows/texts are run in length-sorted batches capped by padded tokens, not item count.
+        self.windowed = WindowedClassifier(self.classifier, max_length, long_documents, max_windows=max_windows,
+                                           max_batch_tokens=max_batch_tokens, max_batch_size=max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        # With route_languages, analyze_batch() takes each row's detected language and sends non-English
+        # rows to the multilingual model, which is only loaded once such a row turns up. Each model
+        # batches its own rows, with the same token limits.
+        self.router = language_router() if route_languages else None
+        self._windowed: Dict[str, WindowedClassifier] = {MODEL_NAME: self.windowed}
+        self._windowing = dict(max_length=max_length, mode=long_documents, max_windows=max_windows,
+                               max_batch_tokens=max_batch_tokens, max_batch_size=max_batch_size)
+
+    def load(self) -> None:
+        """Builds the model now instead of on the first text."""
         try:
-            self.classifier = pipeline(
-                "sentiment-analysis",
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                return_all_scores=True
-            )
+            self.classifier.model
         except Exception as e:
             raise AnalysisError(f"Model loading failed: {str(e)}")
 
     def analyze(self, text: str) -> str:
+        if self.cache is not None:
+            cached = self.cache.get(text)
+            if cached is not None:
+                return cached
+        self.load()
+        try:
+            label = self._classify([text])[0]
+        except Exception as e:
+            raise AnalysisError(f"Analysis failed: {str(e)}")
+        if self.cache is not None:
+            self.cache.put(text, label)
+        return label
+
+    def analyze_batch(self, texts: List[str], languages: Optional[Sequence[str]] = None) -> List[str]:
+        """Labels texts; with language routing, languages gives each text's detected language."""
+        texts = list(texts)
+        models = self.router.assign(languages) if self.router is not None and languages is not None else None
+        labels = {}
+        entries = {}
+        for text, model_id in zip(texts, models or repeat(MODEL_NAME)):
+            key = cache_key(text, model_id)
+            if key not in labels:
+                labels[key] = self.cache.get(key) if self.cache is not None else None
+                entries[key] = (text, model_id)
+
+        # Each distinct uncached text is scored once
+        missing = [key for key, label in labels.items() if label is None]
+        if missing:
+            self.load()
+        try:
+            if models is None:
+                results = self._classify([entries[key][0] for key in missing]) if missing else []
+            else:
+                results = self.router.run([entries[key][0] for key in missing], [entries[key][1] for key in missing],
+                                          self._classify)
+        except Exception as e:
+            raise AnalysisError(f"Analysis failed: {str(e)}")
+
+        for key, label in zip(missing, results):
+            labels[key] = label
+            if self.cache is not None:
+                self.cache.put(key, label)
+        return [labels[cache_key(text, model_id)] for text, model_id in zip(texts, models or repeat(MODEL_NAME))]
+
+    def analyze_model_batch(self, texts: List[str], model_id: str = MODEL_NAME) -> List[str]:
+        """Labels texts with one given model, without the cache (for rows already routed elsewhere)."""
+        texts = list(texts)
+        distinct = list(dict.fromkeys(texts))
+        try:
+            labels = dict(zip(distinct, self._classify(distinct, model_id))) if distinct else {}
+        except Exception as e:
+            raise AnalysisError(f"Analysis failed: {str(e)}")
+        return [labels[text] for text in texts]
+
+    def analyze_token_rows(self, token_cache, rows: Sequence[int]) -> List[str]:
+        """Labels rows of a sentiment_common.token_cache.TokenCache, feeding its token ids straight to the model.
+
+        Nothing is tokenized here; rows are batched by their cached lengths like analyze_batch().
+        """
+        rows = list(rows)
+        labels: List[str] = [None] * len(rows)
+        if not rows:
+            return labels
+        self.load()
         try:
-            result = self.classifier(text)
-            # Extract the label with highest score
-            return max(result[0], key=lambda x: x['score'])['label'].capitalize()
+            for batch in token_budget_batches(token_cache.lengths(rows), self.max_batch_tokens, self.max_batch_size):
+                scored = ScoredBatch.from_probabilities(*token_probabilities(
+                    self.classifier, *token_cache.batch([rows[i] for i in batch])))
+                for index, label in zip(batch, map_labels(scored.labels, self._sentiment).tolist()):
+                    labels[index] = label
         except Exception as e:
             raise AnalysisError(f"Analysis failed: {str(e)}")
+        return labels
+
+    def _classify(self, texts: List[str], model_id: str = MODEL_NAME) -> List[str]:
+        windowed = self._windowed.get(model_id)
+        if windowed is None:
+            # Loaded on first use, from the registry like the main model
+            windowed = WindowedClassifier(LazyModel(partial(shared_pipeline, model_id, self.backend)),
+                                          **self._windowing)
+            self._windowed[model_id] = windowed
+        # The label with highest score, mapped for the whole batch at once
+        return map_labels(windowed.scored(texts).labels, partial(self._sentiment, model_id=model_id)).tolist()
 
+    @staticmethod
+    def _sentiment(raw_label: str, model_id: str = MODEL_NAME) -> str:
+        return model_spec(model_id).label(raw_label).capitalize()
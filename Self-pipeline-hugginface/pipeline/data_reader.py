@@ -1,11 +1,66 @@
-import pandas as pd
+from typing import TYPE_CHECKING, Iterator, Optional
+from sentiment_common.readers import input_format, read_record_batches
 from .exceptions import DataReadError
 
-def read_csv(file_path: str) -> pd.DataFrame:
+if TYPE_CHECKING:
+    import pandas as pd
+
+def read_csv(file_path: str) -> 'pd.DataFrame':
+    import pandas as pd  # Imported on first use so --help stays fast
+
     try:
         df = pd.read_csv(file_path)
         if 'text' not in df.columns:
             raise ValueError("CSV must contain 'text' column")
         return df
     except Exception as e:
-        raise DataReadError(f"Error reading {file_path}: {str(e)}")
\ No newline at end of file
+        raise DataReadError(f"Error reading {file_path}: {str(e)}")
+
+def read_csv_chunks(file_path: str, chunksize: int, skip_rows: int = 0) -> Iterator['pd.DataFrame']:
+    """Yields the CSV in chunks of chunksize rows, starting after the first skip_rows rows.
+
+    Columns are read as strings so every chunk is written back exactly as it was read,
+    however the file is split into chunks (e.g. when a run is resumed part way through).
+    """
+    import pandas as pd
+
+    try:
+        header = pd.read_csv(file_path, nrows=0)
+        if 'text' not in header.columns:
+            raise ValueError("CSV must contain 'text' column")
+        chunks = pd.read_csv(file_path, dtype=str, chunksize=chunksize)
+        for chunk in chunks:
+            if skip_rows >= len(chunk):
+                skip_rows -= len(chunk)
+                continue
+            yield chunk.iloc[skip_rows:]
+            skip_rows = 0
+    except Exception as e:
+        raise DataReadError(f"Error reading {file_path}: {str(e)}")
+
+def read_input_chunks(file_path: str, chunksize: int, skip_rows: int = 0,
+                      id_column: Optional[str] = 'id') -> Iterator['pd.DataFrame']:
+    """read_csv_chunks() for any input format: CSV, Parquet, Arrow IPC or JSONL, picked by file extension.
+
+    CSV goes through read_csv_chunks() unchanged. The columnar formats are read as Arrow
+    record batches of just the 'text' column (plus id_column, when the file has it), so
+    the other columns of a wide export are never decoded. Chunks are indexed by input
+    row number, as read_csv_chunks() chunks are.
+    """
+    import pandas as pd
+
+    try:
+        if input_format(file_path) == 'csv':
+            yield from read_csv_chunks(file_path, chunksize, skip_rows)
+            return
+        position = skip_rows
+        optional_columns = [id_column] if id_column else []
+        for batch in read_record_batches(file_path, ['text'], chunksize, skip_rows, optional_columns):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(position, position + len(chunk))
+            position += len(chunk)
+            yield chunk
+    except DataReadError:
+        raise
+    except Exception as e:
+        raise DataReadError(f"Error reading {file_path}: {str(e)}")
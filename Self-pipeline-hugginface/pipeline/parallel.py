@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Iterable, List, Optional, Sequence, Tuple
+from sentiment_common.tuning import set_torch_threads
+from .analyzer import MODEL_NAME, SentimentAnalyzer, cache_key, language_router
+from .exceptions import AnalysisError
+
+# Analyzer owned by the current worker process, built once by _init_worker
+_analyzer = None
+
+def _init_worker(threads_per_worker: int, max_batch_tokens: int, backend: str, max_length: int,
+                 long_documents: str, max_windows: int) -> None:
+    global _analyzer
+    set_torch_threads(threads_per_worker)
+    _analyzer = SentimentAnalyzer(max_batch_tokens=max_batch_tokens, backend=backend, max_length=max_length,
+                                  long_documents=long_documents, max_windows=max_windows)
+    _analyzer.load()  # Warm the worker up front rather than on its first shard
+
+def _analyze_shard(shard: Tuple[List[str], str]) -> List[str]:
+    texts, model_id = shard
+    return _analyzer.analyze_model_batch(texts, model_id)
+
+def default_threads_per_worker(workers: int) -> int:
+    # Split the cores evenly so the workers' intra-op thread pools don't oversubscribe the host
+    return max(1, (os.cpu_count() or 1) // workers)
+
+class ShardedAnalyzer:
+    """Analyzes texts in shards across a pool of worker processes, returning results in input order.
+
+    The pool (and each worker's model) is created on first use and reused by later
+    calls until close(). With a ResultCache, cached texts and repeats are resolved in
+    the parent and only the distinct uncached texts are sent to the workers.
+
+    With route_languages, rows are assigned to a model by language in the parent and
+    every shard holds one model's rows only; a worker loads a model when it first
+    gets a shard for it.
+    """
+
+    def __init__(self, workers: int, shard_size: int = 256, threads_per_worker: int = None,
+                 cache=None, max_batch_tokens: int = 4096, backend: str = 'torch', max_length: int = 512,
+                 long_documents: str = 'truncate', max_windows: int = None, route_languages: bool = False):
+        self.workers = workers
+        self.shard_size = shard_size
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(workers)
+        self.cache = cache
+        self.max_batch_tokens = max_batch_tokens
+        self.backend = backend
+        self.max_length = max_length
+        self.long_documents = long_documents
+        self.max_windows = max_windows
+        self.router = language_router() if route_languages else None
+        self._pool = None
+
+    def analyze_batch(self, texts: Iterable[str], languages: Optional[Sequence[str]] = None) -> List[str]:
+        texts = list(texts)
+        models = self.router.assign(languages) if self.router is not None and languages is not None else None
+        if self.cache is None:
+            return self._analyze_routed(texts, models)
+
+        labels = {}
+        entries = {}
+        for text, model_id in zip(texts, models or repeat(MODEL_NAME)):
+            key = cache_key(text, model_id)
+            if key not in labels:
+                labels[key] = self.cache.get(key)
+                entries[key] = (text, model_id)
+        missing = [key for key, label in labels.items() if label is None]
+        fresh = self._analyze_routed([entries[key][0] for key in missing],
+                                     [entries[key][1] for key in missing] if models is not None else None)
+        for key, label in zip(missing, fresh):
+            labels[key] = label
+            self.cache.put(key, label)
+        return [labels[cache_key(text, model_id)] for text, model_id in zip(texts, models or repeat(MODEL_NAME))]
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _analyze_routed(self, texts: List[str], models: Optional[List[str]]) -> List[str]:
+        if models is None:
+            return self._analyze_in_pool(texts)
+        return self.router.run(texts, models, self._analyze_in_pool)
+
+    def _analyze_in_pool(self, texts: List[str], model_id: str = MODEL_NAME) -> List[str]:
+        if not texts:
+            return []
+        shards = [(texts[i:i + self.shard_size], model_id) for i in range(0, len(texts), self.shard_size)]
+
+        results = []
+        try:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.threads_per_worker, self.max_batch_tokens,
+                                                           self.backend, self.max_length, self.long_documents,
+                                                           self.max_windows))
+            # map() yields shard results in submission order, so the output lines up with the input
+            for shard_results in self._pool.map(_analyze_shard, shards):
+                results.extend(shard_results)
+        except AnalysisError:
+            raise
+        except Exception as e:
+            raise AnalysisError(f"Sharded analysis failed: {str(e)}")
+        return results
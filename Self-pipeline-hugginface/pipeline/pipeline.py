@@ -1,19 +1,192 @@
-from typing import Callable, Any
+import cProfile
+import importlib.util
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Callable, Any, Dict, Iterable, Iterator, Optional, Tuple
+from sentiment_common.profiling import StageProfiler, count_items
+
+# Marks the end of the stream on a stage queue
+_END = object()
 
 class Pipeline:
-    def __init__(self):
+    """Runs its stages in order, timing each one by name.
+
+    Every stage records wall time, CPU time, calls, output items and items/sec in
+    self.profiler; report() returns them as a dict. With profile_dir, each stage also
+    runs under cProfile (saved as <stage>.prof), and stages added with
+    torch_profile=True run their first call under the torch profiler instead, saving
+    its op table (<stage>.torch.txt and .json) when torch is installed.
+
+    run() passes one input through every stage. run_streaming() instead takes an
+    iterable of chunks and runs all stages at once, each in its own thread and joined
+    by bounded queues, so chunk k+1 is read and cleaned while chunk k is analyzed.
+    """
+
+    def __init__(self, profile_dir: Optional[str] = None):
         self.stages = []
-        
-    def add_stage(self, stage: Callable[[Any], Any]) -> None:
-        self.stages.append(stage)
-        
+        self.profiler = StageProfiler()
+        self.profile_dir = profile_dir
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._torch_profiled = set()
+
+    def add_stage(self, stage: Callable[[Any], Any], name: Optional[str] = None,
+                  torch_profile: bool = False) -> None:
+        if name is None:
+            name = getattr(stage, '__name__', '<lambda>')
+            if name == '<lambda>':
+                name = f"stage_{len(self.stages) + 1}"
+        self.stages.append((name, stage, torch_profile))
+
     def run(self, initial_input: Any) -> Any:
         data = initial_input
-        for stage in self.stages:
+        for name, stage, torch_profile in self.stages:
+            start, cpu_start = time.perf_counter(), time.process_time()
             try:
-                data = stage(data)
+                data = self._run_stage(name, stage, torch_profile, data)
             except Exception as e:
                 print(f"Pipeline Error: {str(e)}")
                 return None
+            self.profiler.add(name, time.perf_counter() - start, count_items(data), time.process_time() - cpu_start)
         return data
-    
\ No newline at end of file
+
+    def run_streaming(self, chunks: Iterable[Any], queue_size: int = 2) -> Iterator[Tuple[Any, Any]]:
+        """Streams chunks through all stages concurrently and yields (chunk, output) pairs in input order.
+
+        Iterating chunks (e.g. reading the CSV) runs in a thread too. Every queue holds at
+        most queue_size chunks, so memory is bounded by queue depth, not input size. If a
+        stage fails, the error is printed as in run(), (chunk, None) is yielded for the
+        chunk that failed and the stream ends. Stages are timed, but not cProfiled.
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(chunks, queues[0], stop),
+                                    name='pipeline-source', daemon=True)]
+        for (name, stage, _), inbox, outbox in zip(self.stages, queues, queues[1:]):
+            threads.append(threading.Thread(target=self._stream_stage, args=(name, stage, inbox, outbox, stop),
+                                            name=f'pipeline-{name}', daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = self._get(queues[-1], stop)
+                if item is _END:
+                    return
+                chunk, data, error = item
+                if error is not None:
+                    print(f"Pipeline Error: {str(error)}")
+                    yield chunk, None
+                    return
+                yield chunk, data
+        finally:
+            # Also runs when the caller stops early; the other threads notice stop and exit
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _feed(self, chunks: Iterable[Any], outbox: queue.Queue, stop: threading.Event) -> None:
+        try:
+            for chunk in chunks:
+                if not self._put(outbox, (chunk, chunk, None), stop):
+                    return
+        except Exception as e:
+            self._put(outbox, (None, None, e), stop)
+            return
+        self._put(outbox, _END, stop)
+
+    def _stream_stage(self, name: str, stage: Callable[[Any], Any],
+                      inbox: queue.Queue, outbox: queue.Queue, stop: threading.Event) -> None:
+        while True:
+            item = self._get(inbox, stop)
+            if item is _END:
+                break
+            chunk, data, error = item
+            if error is None:
+                start, cpu_start = time.perf_counter(), time.process_time()
+                try:
+                    data = stage(data)
+                except Exception as e:
+                    error = e
+                else:
+                    self.profiler.add(name, time.perf_counter() - start, count_items(data),
+                                      time.process_time() - cpu_start)
+            # An error travels downstream to the consumer, and this stage stops there
+            if not self._put(outbox, (chunk, data, error), stop) or error is not None:
+                return
+        self._put(outbox, _END, stop)
+
+    @staticmethod
+    def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+        # Blocks while the queue is full (backpressure), but gives up once the stream is stopped
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: threading.Event) -> Any:
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
+
+    def _run_stage(self, name: str, stage: Callable[[Any], Any], torch_profile: bool, data: Any) -> Any:
+        if self.profile_dir is None:
+            return stage(data)
+        if torch_profile and name not in self._torch_profiled and importlib.util.find_spec('torch'):
+            return self._run_with_torch_profiler(name, stage, data)
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        profile.enable()
+        try:
+            return stage(data)
+        finally:
+            profile.disable()
+
+    def _run_with_torch_profiler(self, name: str, stage: Callable[[Any], Any], data: Any) -> Any:
+        import torch
+
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as prof:
+            result = stage(data)
+        events = prof.key_averages()
+        path = self._profile_path(name, '.torch')
+        with open(path + '.txt', 'w') as f:
+            f.write(events.table(sort_by='cpu_time_total', row_limit=40))
+        with open(path + '.json', 'w') as f:
+            json.dump([{
+                'op': event.key,
+                'calls': event.count,
+                'cpu_time_total_us': event.cpu_time_total,
+                'self_cpu_time_total_us': event.self_cpu_time_total,
+            } for event in sorted(events, key=lambda e: e.cpu_time_total, reverse=True)], f, indent=2)
+        self._torch_profiled.add(name)
+        return result
+
+    def _profile_path(self, name: str, suffix: str) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        return os.path.join(self.profile_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', name) + suffix)
+
+    def report(self) -> Dict[str, Any]:
+        """Per-stage timings, plus the files written in profiler mode. cProfile dumps are refreshed on every call."""
+        report: Dict[str, Any] = {'stages': self.profiler.report()}
+        if self.profile_dir is not None:
+            profiles = []
+            for name, profile in self._profiles.items():
+                path = self._profile_path(name, '.prof')
+                profile.dump_stats(path)
+                profiles.append(path)
+            for name in self._torch_profiled:
+                profiles.append(self._profile_path(name, '.torch.txt'))
+            report['profiles'] = profiles
+        return report
+
+    def write_report(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
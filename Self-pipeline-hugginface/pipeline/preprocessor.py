@@ -1,14 +1,31 @@
-import re
+from typing import Iterable, List, Optional, Sequence
+from sentiment_common.text_normalization import TextNormalizer
 from .exceptions import PreprocessingError
 
+# Bump whenever cleaning changes, so token caches built from the old cleaning are not reused
+PREPROCESSING_VERSION = 1
+
+# Removes special characters except apostrophes, lowercases and collapses whitespace
+normalizer = TextNormalizer(keep_apostrophes=True, strip=True, collapse_whitespace=True)
+# The same, but keeping non-ASCII letters, for rows scored by the multilingual model
+multilingual_normalizer = TextNormalizer(keep_apostrophes=True, strip=True, collapse_whitespace=True,
+                                         unicode_letters=True)
+
 def clean_text(text: str) -> str:
     try:
-        # Remove special characters except apostrophes
-        text = re.sub(r"[^a-zA-Z0-9'\s]", '', text)
-        # Convert to lowercase
-        text = text.lower().strip()
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        return text
+        return normalizer.normalize(text)
+    except Exception as e:
+        raise PreprocessingError(f"Error cleaning text: {str(e)}")
+
+def clean_texts(texts: Iterable[str], keep_non_ascii: Optional[Sequence[bool]] = None) -> List[str]:
+    """Cleans a whole chunk; rows flagged in keep_non_ascii keep their accented and non-Latin letters."""
+    try:
+        if keep_non_ascii is None or not any(keep_non_ascii):
+            return normalizer.normalize_many(texts)
+        texts = texts.tolist() if hasattr(texts, 'tolist') else list(texts)
+        flags = list(keep_non_ascii)
+        ascii_rows = iter(normalizer.normalize_many([text for text, keep in zip(texts, flags) if not keep]))
+        unicode_rows = iter(multilingual_normalizer.normalize_many([text for text, keep in zip(texts, flags) if keep]))
+        return [next(unicode_rows) if keep else next(ascii_rows) for keep in flags]
     except Exception as e:
         raise PreprocessingError(f"Error cleaning text: {str(e)}")
\ No newline at end of file
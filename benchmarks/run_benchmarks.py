@@ -0,0 +1,329 @@
+import argparse
+import asyncio
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+from sentiment_common.backends import BACKENDS
+from sentiment_common.profiling import StageProfiler
+from synthetic_data import LENGTH_DISTRIBUTIONS, write_feedback_csv
+
+PIPELINES = ('final', 'huggingface', 'self')
+
+
+class LatencyRecorder:
+    """Per-row latency from the moment a row is read until its result is written.
+
+    Every pipeline writes results in input order, so rows are matched first in, first out.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self._started = deque()
+
+    def start(self, rows: int = 1) -> None:
+        self._started.extend([time.perf_counter()] * rows)
+
+    def finish(self, rows: int = 1) -> None:
+        now = time.perf_counter()
+        for _ in range(rows):
+            self.samples.append(now - self._started.popleft())
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {'p50': None, 'p99': None, 'max': None}
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+        return {'p50': percentile(50), 'p99': percentile(99), 'max': ordered[-1] * 1000}
+
+
+def _load_module(path: Path, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_final(args, workdir: Path, profiler: StageProfiler, latency: LatencyRecorder) -> None:
+    """Runs pipecat-pipeline/final.py end to end, with its reader, model and writer timed."""
+    shutil.copy(args.input, workdir / 'input_data.csv')
+    os.chdir(workdir)
+    final = _load_module(REPO_ROOT / 'pipecat-pipeline' / 'final.py', 'final')
+    if args.model:
+        final.MODEL_NAME = args.model
+
+    load_classifier = final.load_classifier
+    final.load_classifier = lambda *a, **kw: profiler.wrap('inference', load_classifier(*a, **kw))
+    final.normalizer.normalize_many = profiler.wrap('preprocess', final.normalizer.normalize_many)
+
+    class TimedReader(final.TextStreamReader):
+        def _load_next_chunk(self):
+            start = time.perf_counter()
+            loaded = super()._load_next_chunk()
+            profiler.add('read', time.perf_counter() - start, len(self._texts))
+            return loaded
+
+        def next_row(self):
+            row = super().next_row()
+            if row is not None:
+                latency.start()
+            return row
+
+    class TimedWriter(final.StreamingCsvWriter):
+        def write(self, row):
+            with profiler.stage('write', 1):
+                super().write(row)
+            latency.finish()
+
+        def close(self):
+            with profiler.stage('write'):
+                super().close()
+
+    final.TextStreamReader = TimedReader
+    final.StreamingCsvWriter = TimedWriter
+    asyncio.run(final.run_sentiment_analysis(max_batch_size=args.batch_size, backend=args.backend))
+
+
+def bench_huggingface(args, workdir: Path, profiler: StageProfiler, latency: LatencyRecorder) -> None:
+    """Drives the huggingface_pipeline components row by row, the way its Pipeline would."""
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_ROOT / 'huggingface_pipeline'))
+    import pandas as pd
+    import pipeline.sentiment_analyzer
+    from pipeline.output import OutputWriter
+    from pipeline.preprocessor import Preprocessor
+
+    if args.model:
+        pipeline.sentiment_analyzer.MODEL_NAME = args.model
+    preprocessor = Preprocessor()
+    analyzer = pipeline.sentiment_analyzer.SentimentAnalyzer(backend=args.backend)
+    with OutputWriter(str(workdir / 'output_results.csv')) as writer:
+        start = time.perf_counter()
+        data = pd.read_csv(args.input)
+        profiler.add('read', time.perf_counter() - start, len(data))
+        for text in data['text']:
+            latency.start()
+            with profiler.stage('preprocess', 1):
+                cleaned = preprocessor.process(text)
+            with profiler.stage('inference', 1):
+                result = analyzer.model(cleaned)[0]
+            with profiler.stage('write', 1):
+                writer.process({"text": cleaned, "sentiment": pipeline.sentiment_analyzer.sentiment_label(result),
+                                "confidence": result['score']})
+            latency.finish()
+        with profiler.stage('write'):
+            writer.finalize()
+
+
+def bench_self(args, workdir: Path, profiler: StageProfiler, latency: LatencyRecorder) -> None:
+    """Runs Self-pipeline-hugginface/main.py end to end, with its chunk reader, stages and writer timed."""
+    input_path = Path('data/input/sample_feedback.csv')
+    (workdir / input_path.parent).mkdir(parents=True)
+    shutil.copy(args.input, workdir / input_path)
+    os.chdir(workdir)
+    self_dir = REPO_ROOT / 'Self-pipeline-hugginface'
+    sys.path.insert(0, str(self_dir))
+    import pipeline.analyzer
+    main = _load_module(self_dir / 'main.py', 'self_main')
+    if args.model:
+        pipeline.analyzer.MODEL_NAME = main.MODEL_NAME = args.model
+
+    read_input_chunks = main.read_input_chunks
+
+    def timed_chunks(chunks):
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            profiler.add('read', time.perf_counter() - start, len(chunk))
+            latency.start(len(chunk))
+            yield chunk
+
+    def timed_input_chunks(file_path, *a, **kw):
+        return timed_chunks(read_input_chunks(file_path, *a, **kw))
+
+    class TimedAnalyzer(main.SentimentAnalyzer):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.analyze_batch = profiler.wrap('inference', self.analyze_batch)
+
+    class TimedWriter(main.StreamingCsvWriter):
+        def write_frame(self, df):
+            with profiler.stage('write', len(df)):
+                super().write_frame(df)
+            latency.finish(len(df))
+
+        def close(self):
+            with profiler.stage('write'):
+                super().close()
+
+    main.read_input_chunks = timed_input_chunks
+    main.clean_texts = profiler.wrap('preprocess', main.clean_texts)
+    main.SentimentAnalyzer = TimedAnalyzer
+    main.StreamingCsvWriter = TimedWriter
+    # A tuned profile on this host would change the settings between runs; benchmarks use the defaults
+    sys.argv = ['main.py', '--backend', args.backend, '--chunk-size', str(args.chunk_size), '--no-tuned-profile']
+    main.main()
+
+
+BENCHMARKS = {'final': bench_final, 'huggingface': bench_huggingface, 'self': bench_self}
+
+
+def run_child(args) -> None:
+    """Benchmarks one pipeline in this process and writes its measurements to args.result."""
+    profiler = StageProfiler()
+    latency = LatencyRecorder()
+    workdir = Path(args.workdir).resolve()
+    args.input = str(Path(args.input).resolve())
+    result_path = Path(args.result).resolve()
+
+    start = time.perf_counter()
+    BENCHMARKS[args.child](args, workdir, profiler, latency)
+    elapsed = time.perf_counter() - start
+
+    stages = profiler.report()
+    if args.child == 'final' and 'read' in stages and 'preprocess' in stages:
+        # final.py preprocesses each chunk as it is loaded; keep 'read' to the parsing alone
+        read = stages['read']
+        read['seconds'] = max(0.0, read['seconds'] - stages['preprocess']['seconds'])
+        read['items_per_sec'] = read['items'] / read['seconds'] if read['seconds'] > 0 else 0.0
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    rows = len(latency.samples)
+    result_path.write_text(json.dumps({
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': latency.summary(),
+        'stages': stages,
+        'peak_rss_mb': peak_rss_mb,
+    }, indent=2))
+
+
+def benchmark_pipeline(name: str, args, workdir: Path) -> dict:
+    """Runs one pipeline's benchmark in a fresh interpreter, so imports and peak RSS don't leak between them."""
+    child_dir = workdir / name
+    child_dir.mkdir()
+    result_path = workdir / f'{name}.json'
+    command = [sys.executable, str(Path(__file__).resolve()), '--child', name,
+               '--input', str(args.input), '--workdir', str(child_dir), '--result', str(result_path),
+               '--backend', args.backend, '--batch-size', str(args.batch_size),
+               '--chunk-size', str(args.chunk_size)]
+    if args.model:
+        command += ['--model', args.model]
+    completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0 or not result_path.exists():
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(result_path.read_text())
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_summary(report: dict, baseline: dict = None) -> None:
+    print(f"{'pipeline':<12}{'rows/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'peak MB':>9}  stages (items/s)")
+    for name, result in report['pipelines'].items():
+        if 'error' in result:
+            print(f"{name:<12}  failed: {result['error']}")
+            continue
+        latency = result['latency_ms']
+        stages = ', '.join(f"{stage} {stats['items_per_sec']:.0f}" for stage, stats in result['stages'].items())
+        print(f"{name:<12}{result['rows_per_sec']:>10.1f}{latency['p50'] or 0:>9.2f}{latency['p99'] or 0:>9.2f}"
+              f"{result['peak_rss_mb']:>9.1f}  {stages}")
+        previous = (baseline or {}).get('pipelines', {}).get(name)
+        if previous and 'error' not in previous and previous['rows_per_sec'] > 0:
+            change = result['rows_per_sec'] / previous['rows_per_sec'] - 1
+            print(f"{'':<12}{change:>+10.1%} rows/s vs baseline ({baseline['environment']['revision']})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the sentiment pipelines on synthetic feedback")
+    parser.add_argument("--pipelines", nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument("--rows", type=int, default=5000, help="synthetic feedback rows to generate")
+    parser.add_argument("--mean-words", type=int, default=20, help="average text length in words")
+    parser.add_argument("--length-distribution", choices=LENGTH_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="share of rows repeating an earlier text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default='stub',
+                        help="'stub' measures pipeline overhead with a deterministic fake model")
+    parser.add_argument("--model", default=None,
+                        help="model id or local checkpoint (e.g. a tiny model) to use instead of each pipeline's own")
+    parser.add_argument("--batch-size", type=int, default=16, help="final.py micro-batch size")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Self-pipeline chunk size")
+    parser.add_argument("--output", default=None,
+                        help="JSON report path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare throughput against")
+    parser.add_argument("--input", default=None, help="use this CSV instead of generating one")
+    # Internal: run a single pipeline's benchmark (used by the parent process)
+    parser.add_argument("--child", choices=PIPELINES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    workdir = Path(tempfile.mkdtemp(prefix='sentiment-bench-'))
+    try:
+        if args.input is None:
+            args.input = str(workdir / 'feedback.csv')
+            write_feedback_csv(args.input, args.rows, args.mean_words, args.length_distribution,
+                               args.duplicate_rate, args.seed)
+        args.input = str(Path(args.input).resolve())
+        results = {name: benchmark_pipeline(name, args, workdir) for name in args.pipelines}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    created = datetime.datetime.now(datetime.timezone.utc)
+    report = {
+        'created': created.isoformat(timespec='seconds'),
+        'config': {key: getattr(args, key) for key in (
+            'rows', 'mean_words', 'length_distribution', 'duplicate_rate', 'seed',
+            'backend', 'model', 'batch_size', 'chunk_size')},
+        'environment': {
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'pipelines': results,
+    }
+    output = Path(args.output) if args.output else (
+        Path(__file__).resolve().parent / 'results' / f"{created.strftime('%Y%m%dT%H%M%SZ')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print_summary(report, baseline)
+    print(f"\nReport saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
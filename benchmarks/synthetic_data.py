@@ -0,0 +1,67 @@
+import csv
+import math
+import random
+from typing import List
+
+POSITIVE = ["great", "love", "excellent", "fast", "helpful", "amazing", "friendly", "easy", "perfect", "happy"]
+NEGATIVE = ["terrible", "slow", "broken", "rude", "awful", "refund", "crashed", "late", "worst", "confusing"]
+NEUTRAL = ["the", "app", "order", "delivery", "support", "product", "price", "was", "it", "and", "my", "team",
+           "update", "account", "screen", "after", "today", "with", "service", "again"]
+# Punctuation, mentions and non-ASCII so the text normalizers have real work to do
+DECORATIONS = ["!", "?", "...", ",", "@support", "#fail", "$20", ":)", "😀", "très", "naïve"]
+
+LENGTH_DISTRIBUTIONS = ('lognormal', 'uniform', 'fixed')
+
+
+def _length(rng: random.Random, mean_words: int, distribution: str) -> int:
+    if distribution == 'fixed':
+        return mean_words
+    if distribution == 'uniform':
+        return rng.randint(1, 2 * mean_words - 1)
+    if distribution == 'lognormal':
+        # sigma 0.75 gives the long tail real feedback has: mostly short, a few very long
+        sigma = 0.75
+        return max(1, round(rng.lognormvariate(math.log(mean_words) - sigma ** 2 / 2, sigma)))
+    raise ValueError(f"Unknown length distribution: {distribution!r} (expected one of {', '.join(LENGTH_DISTRIBUTIONS)})")
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    tone = rng.choice((POSITIVE, NEGATIVE, NEUTRAL))
+    out = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.25:
+            out.append(rng.choice(tone))
+        elif roll < 0.3:
+            out.append(rng.choice(DECORATIONS))
+        else:
+            out.append(rng.choice(NEUTRAL))
+    out[0] = out[0].capitalize()
+    return ' '.join(out)
+
+
+def generate_feedback(rows: int, mean_words: int = 20, length_distribution: str = 'lognormal',
+                      duplicate_rate: float = 0.2, seed: int = 0) -> List[str]:
+    """Returns rows synthetic feedback texts; the same arguments always give the same texts.
+
+    Text lengths (in words) follow length_distribution around mean_words. A duplicate_rate
+    share of the rows repeat an earlier text exactly, as repeated feedback does.
+    """
+    rng = random.Random(seed)
+    texts: List[str] = []
+    for _ in range(rows):
+        if texts and rng.random() < duplicate_rate:
+            texts.append(rng.choice(texts))
+        else:
+            texts.append(_sentence(rng, _length(rng, mean_words, length_distribution)))
+    return texts
+
+
+def write_feedback_csv(path: str, rows: int, mean_words: int = 20, length_distribution: str = 'lognormal',
+                       duplicate_rate: float = 0.2, seed: int = 0) -> None:
+    """Writes generate_feedback() output to path as a CSV with id and text columns."""
+    texts = generate_feedback(rows, mean_words, length_distribution, duplicate_rate, seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'text'])
+        writer.writerows(enumerate(texts))
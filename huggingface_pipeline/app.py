@@ -4,14 +4,16 @@ from pipeline.sentiment_analyzer import SentimentAnalyzer
 from pipeline.output import OutputWriter
 
 def run_pipeline(user_input, output_file):
-    # Initialize the pipeline with the processors
-    pipeline = Pipeline([
-        Preprocessor(),
-        SentimentAnalyzer(),
-        OutputWriter(output_file)
-    ])
-    # Process the user input
-    pipeline.run(user_input)
+    # The writer opens '<output_file>.part' right away; leaving the block finalizes or removes it
+    with OutputWriter(output_file) as writer:
+        # Initialize the pipeline with the processors
+        pipeline = Pipeline([
+            Preprocessor(),
+            SentimentAnalyzer(),
+            writer
+        ])
+        # Process the user input
+        pipeline.run(user_input)
 
 if __name__ == "__main__":
     # Prompt the user for input
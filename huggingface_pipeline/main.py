@@ -5,14 +5,16 @@ from pipeline.sentiment_analyzer import SentimentAnalyzer
 from pipeline.output import OutputWriter
 
 def run_pipeline(input_file, output_file):
-    components = [
-        DataReader(input_file),
-        Preprocessor(),
-        SentimentAnalyzer(),
-        OutputWriter(output_file)
-    ]
-    pipeline = Pipeline(components)
-    #pipeline.run()
+    # The writer opens '<output_file>.part' right away; leaving the block finalizes or removes it
+    with OutputWriter(output_file) as writer:
+        components = [
+            DataReader(input_file),
+            Preprocessor(),
+            SentimentAnalyzer(),
+            writer
+        ]
+        pipeline = Pipeline(components)
+        #pipeline.run()
 
 if __name__ == "__main__":
     input_csv = "data/sample_feedback.csv"
@@ -43,18 +43,20 @@
 #         except Exception as e:
 #             print(f"Error reading data: {e}")
 
-import pandas as pd
 from pipecat.processors.frame_processor import FrameProcessor
+from sentiment_common.readers import iter_input_rows
 
 class DataReader(FrameProcessor):
-    def __init__(self, file_path):
+    def __init__(self, file_path, id_column='id', chunksize=10_000):
         super().__init__()
         self.file_path = file_path
+        # CSV, Parquet, Arrow IPC or JSONL (by extension); only 'text' and id_column are read
+        self.id_column = id_column
+        self.chunksize = chunksize
 
     async def process_frame(self, frame, direction):
         try:
-            data = pd.read_csv(self.file_path)
-            for _, row in data.iterrows():
-                await self.push_frame(row.to_dict(), direction)
+            for row in iter_input_rows(self.file_path, id_column=self.id_column, chunksize=self.chunksize):
+                await self.push_frame(row, direction)
         except Exception as e:
             print(f"Error reading data: {e}")
@@ -1,20 +1,52 @@
-import pandas as pd
 from pipecat.processors.frame_processor import FrameProcessor
+from sentiment_common.writers import StreamingCsvWriter
 
 class OutputWriter(FrameProcessor):
-    def __init__(self, filename):
+    def __init__(self, filename, flush_rows=1000, flush_interval=5.0):
         super().__init__()  # Initialize the base FrameProcessor class
         self.filename = filename
-        self.results = []
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        # Rows are appended to '<filename>.part' in chunks and renamed to filename on finalize().
+        # The file is only opened for the first row, so a run that writes nothing leaves no file behind.
+        self.writer = None
+        self.finished = False
 
     def process(self, data):
         if data:
-            self.results.append(data)
+            try:
+                if self.writer is None:
+                    self.writer = StreamingCsvWriter(self.filename, flush_rows=self.flush_rows,
+                                                     flush_interval=self.flush_interval)
+                self.writer.write(data)
+            except Exception as e:
+                print(f"Error saving results: {str(e)}")
     
     def finalize(self):
+        self.finished = True
+        if self.writer is None:
+            print(f"No results to save to {self.filename}")
+            return
         try:
-            df = pd.DataFrame(self.results)
-            df.to_csv(self.filename, index=False)
+            self.writer.close()
             print(f"Results saved to {self.filename}")
         except Exception as e:
             print(f"Error saving results: {str(e)}")
+
+    def abort(self):
+        # Nothing resumes a run of this pipeline, so a half-written '.part' file is only clutter
+        self.finished = True
+        if self.writer is not None:
+            self.writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Used as a context manager, the output is always finalized or removed, never left behind as '.part'
+        if self.finished:
+            return
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.abort()
@@ -1,17 +1,25 @@
-import re
 from pipecat.processors.frame_processor import FrameProcessor
+from sentiment_common.text_normalization import TextNormalizer
+
+# Keeps letters, digits and whitespace, lowercases and strips
+normalizer = TextNormalizer(strip=True)
 
 
 class Preprocessor(FrameProcessor):
     def process(self, text):
         try:
-            cleaned = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-            cleaned = cleaned.lower().strip()
-            return cleaned
+            return normalizer.normalize(text)
         except Exception as e:
             print(f"Error preprocessing text: {str(e)}")
             return None
 
+    def process_batch(self, texts):
+        try:
+            return normalizer.normalize_many(texts)
+        except Exception:
+            # Fall back to row by row so only the bad rows become None
+            return [self.process(text) for text in texts]
+
 
 # import re
 # from pipecat.processors.frame_processor import FrameProcessor
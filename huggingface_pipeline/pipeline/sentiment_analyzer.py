@@ -1,23 +1,43 @@
-from transformers import pipeline
 from pipecat.processors.frame_processor import FrameProcessor
+from functools import partial
+from sentiment_common.registry import TWITTER_ROBERTA_LATEST, model_spec, shared_pipeline
+from sentiment_common.startup import LazyModel
+
+
+MODEL_NAME = TWITTER_ROBERTA_LATEST
+
+
+def load_model(backend='torch'):
+    # transformers is imported here, not at module import, so startup stays fast.
+    # backend: 'torch' (float32), 'int8' (dynamically quantized) or 'onnx' (ONNX Runtime)
+    # Loaded once per process by the registry; every analyzer (and the server) shares it
+    return shared_pipeline(MODEL_NAME, backend)
+
+
+def sentiment_label(result):
+    # The model's label map is declared in the registry rather than re-implemented here
+    return model_spec(MODEL_NAME).sentiment(result)
+
 
 class SentimentAnalyzer(FrameProcessor):
-    def __init__(self):
+    def __init__(self, executor=None, backend='torch'):
         super().__init__()  # Initialize the base FrameProcessor class
-        self.model = pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest"
-        )
+        # With an InferenceExecutor the model is built and run in its thread/process pool instead
+        self.executor = executor
+        self.model = LazyModel(partial(load_model, backend)) if executor is None else None  # Built on the first text
 
     async def process_frame(self, frame, direction):
         text = frame.get('text')
         if not text:
             return
         try:
-            result = self.model(text)[0]
+            if self.executor is not None:
+                result = (await self.executor.run(text))[0]
+            else:
+                result = self.model(text)[0]
             sentiment_frame = {
                 "text": text,
-                "sentiment": result['label'],
+                "sentiment": sentiment_label(result),
                 "confidence": result['score']
             }
             await self.push_frame(sentiment_frame, direction)
@@ -0,0 +1,166 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pipeline.preprocessor import Preprocessor
+from pipeline.sentiment_analyzer import SentimentAnalyzer, sentiment_label
+from sentiment_common.backends import BACKENDS
+from sentiment_common.batching import DynamicBatcher
+from sentiment_common.startup import startup_timer
+
+
+class SentimentService:
+    """Keeps one warm model and serves single-text requests through a DynamicBatcher.
+
+    Concurrent requests arriving within max_wait_ms of each other are classified in
+    one model call. The model is loaded (and run once) in the background at startup;
+    ready turns True once that has finished.
+    """
+
+    def __init__(self, backend='torch', max_batch_size=32, max_wait_ms=10.0, latency_window=10_000):
+        self.preprocessor = Preprocessor()
+        self.analyzer = SentimentAnalyzer(backend=backend)
+        self.batcher = DynamicBatcher(self._classify, max_batch_size, max_wait_ms)
+        self.ready = False
+        self.load_error = None
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=latency_window)  # Seconds per request, most recent only
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        try:
+            # Straight to the model, not through the batcher, so the dummy text stays out of /metrics
+            self._classify(["warm up"])
+            self.ready = True
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"Error loading model: {self.load_error}")
+
+    def analyze(self, text):
+        cleaned = self.preprocessor.process(text)
+        if cleaned is None:
+            raise ValueError("text could not be preprocessed")
+        result = self.batcher(cleaned)
+        return {"text": cleaned, "sentiment": sentiment_label(result), "confidence": result['score']}
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.requests += 1
+            self.errors += not ok
+            self._latencies.append(seconds)
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            requests, errors = self.requests, self.errors
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else None
+
+        batches = self.batcher.batches
+        return {
+            "ready": self.ready,
+            "uptime_seconds": time.time() - self.started,
+            "requests": requests,
+            "errors": errors,
+            "batches": batches,
+            "mean_batch_size": self.batcher.items / batches if batches else 0.0,
+            "latency_ms": {"p50": percentile(50), "p95": percentile(95), "p99": percentile(99)},
+            "startup_seconds": startup_timer.report(),
+        }
+
+    def _classify(self, texts):
+        # Over-long texts are truncated to the model's limit; one of them must not fail the whole batch
+        return self.analyzer.model(texts, batch_size=len(texts), truncation=True)
+
+
+class SentimentRequestHandler(BaseHTTPRequestHandler):
+    service: SentimentService = None  # Set by make_server()
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {"status": "ok"})
+        elif self.path == '/ready':
+            if self.service.ready:
+                self._send(200, {"status": "ready"})
+            else:
+                self._send(503, {"status": "loading" if self.service.load_error is None else "failed",
+                                 "error": self.service.load_error})
+        elif self.path == '/metrics':
+            self._send(200, self.service.metrics())
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != '/sentiment':
+            self._send(404, {"error": "not found"})
+            return
+        start = time.perf_counter()
+        ok = False
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            text = payload.get('text') if isinstance(payload, dict) else None
+            if not isinstance(text, str) or not text:
+                self._send(400, {"error": "expected a JSON body like {\"text\": \"...\"}"})
+                return
+            if not self.service.ready:
+                self._send(503, {"error": "model is not ready"})
+                return
+            self._send(200, self.service.analyze(text))
+            ok = True
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+        finally:
+            self.service.record(time.perf_counter() - start, ok)
+
+    def log_message(self, format, *args):
+        pass  # Per-request access logs would dominate the output; see /metrics instead
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class SentimentHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128  # Bursts of concurrent callers are what batching is for; don't reset them
+
+
+def make_server(service, host='127.0.0.1', port=8080):
+    handler = type('Handler', (SentimentRequestHandler,), {'service': service})
+    return SentimentHTTPServer((host, port), handler)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve sentiment analysis over HTTP with a warm model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="CPU inference backend")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="most requests merged into one model call")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0,
+                        help="longest a request waits for others to batch with")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    service = SentimentService(args.backend, args.max_batch_size, args.max_wait_ms)
+    server = make_server(service, args.host, args.port)
+    # Listen right away; /ready reports 503 until the model has loaded and answered once
+    threading.Thread(target=service.warm_up, name='warm-up', daemon=True).start()
+    print(f"Serving sentiment analysis on http://{args.host}:{args.port} (POST /sentiment, GET /health /ready /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.batcher.close()
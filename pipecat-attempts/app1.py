@@ -1,45 +1,52 @@
 from typing import List
-from transformers import pipeline
 from pipecat.frames.frames import Frame
 from pipecat.pipeline.base_pipeline import BasePipeline
 from pipecat.processors.frame_processor import FrameProcessor, FrameDirection
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sentiment_common.inference import InferenceExecutor
+from sentiment_common.registry import TWITTER_ROBERTA, model_spec, shared_pipeline
+from sentiment_common.startup import LazyModel
+
+
+def load_classifier():
+    # Use a model that classifies into positive, negative, and neutral
+    return shared_pipeline(TWITTER_ROBERTA)
+
 
 class SentimentAnalysisProcessor(FrameProcessor):
-    def __init__(self):
+    def __init__(self, executor=None):
         super().__init__()
-        # Use a model that classifies into positive, negative, and neutral
-        self.classifier = pipeline(
-            "sentiment-analysis", 
-            model="cardiffnlp/twitter-roberta-base-sentiment", 
-            tokenizer="cardiffnlp/twitter-roberta-base-sentiment"
-        )
+        # With an InferenceExecutor the model is built and run in its thread/process pool instead
+        self.executor = executor
+        self.classifier = LazyModel(load_classifier) if executor is None else None  # Built on first use
 
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         await super().process_frame(frame, direction)
 
         if direction == FrameDirection.DOWNSTREAM:
             text = frame.metadata.get("text", "")
-            result = self.classifier(text)[0]
-            sentiment = result["label"]
-
-            # Mapping label to human-readable sentiment
-            if sentiment == "LABEL_0":
-                sentiment = "negative"
-            elif sentiment == "LABEL_1":
-                sentiment = "neutral"
-            else:
-                sentiment = "positive"
-
-            frame.metadata["sentiment"] = sentiment
+            result = (await self._classify(text))[0]
+
+            # Mapping label to human-readable sentiment (no neutral score band here)
+            frame.metadata["sentiment"] = model_spec(TWITTER_ROBERTA).sentiment(result, neutral_band=False)
             frame.metadata["score"] = result["score"]
             
         await self.push_frame(frame, direction)
 
+    async def _classify(self, text):
+        # Keep the blocking model call off the event loop when an executor is configured
+        if self.executor is not None:
+            return await self.executor.run(text)
+        return self.classifier(text)
+
 
 class SentimentPipeline(BasePipeline):
-    def __init__(self):
+    def __init__(self, executor=None):
         super().__init__()
-        self._processor = SentimentAnalysisProcessor()
+        self._processor = SentimentAnalysisProcessor(executor)
         self._processors: List[FrameProcessor] = [self._processor]
         self._link_processors()
 
@@ -58,20 +65,22 @@ from pipecat.frames.frames import Frame
 from pipecat.processors.frame_processor import FrameDirection
 
 async def run_sentiment_analysis():
-    pipeline = SentimentPipeline()
-    texts = [
-        "I love this product!",
-        "This is the worst experience I've had.",
-        "It's okay, nothing special.",
-        "Absolutely fantastic service!",
-        "I'm not sure how I feel about this."
-        "It was okay, not bad not good."
-    ]
+    # Run the model in a worker thread so it doesn't block the event loop
+    with InferenceExecutor(load_classifier) as executor:  # Shut down however the run ends
+        pipeline = SentimentPipeline(executor)
+        texts = [
+            "I love this product!",
+            "This is the worst experience I've had.",
+            "It's okay, nothing special.",
+            "Absolutely fantastic service!",
+            "I'm not sure how I feel about this."
+            "It was okay, not bad not good."
+        ]
     
-    for text in texts:
-        frame = Frame()
-        frame.metadata = {"text": text}
-        await pipeline.process_frame(frame, FrameDirection.DOWNSTREAM)
-        print(f"Input: {text}\nSentiment: {frame.metadata['sentiment']}\nScore: {frame.metadata['score']}\n")
+        for text in texts:
+            frame = Frame()
+            frame.metadata = {"text": text}
+            await pipeline.process_frame(frame, FrameDirection.DOWNSTREAM)
+            print(f"Input: {text}\nSentiment: {frame.metadata['sentiment']}\nScore: {frame.metadata['score']}\n")
 
 asyncio.run(run_sentiment_analysis())
@@ -3,100 +3,115 @@ import pandas as pd
 from pipecat.frames.frames import Frame
 from pipecat.pipeline.base_pipeline import BasePipeline
 from pipecat.processors.frame_processor import FrameProcessor, FrameDirection
-from transformers import pipeline
-import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sentiment_common.inference import InferenceExecutor
+from sentiment_common.registry import MULTILINGUAL_STARS, model_spec, shared_pipeline
+from sentiment_common.startup import LazyModel
+from sentiment_common.readers import CsvStreamReader
+from sentiment_common.text_normalization import TextNormalizer
 
 # Step 1: Data Reading and Preprocessing
 class DataReadingProcessor(FrameProcessor):
-    def __init__(self, file_path):
+    def __init__(self, file_path, chunksize=10_000):
         super().__init__()
         self.file_path = file_path
+        self.chunksize = chunksize
+        self.reader = None
     
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         # Ensure proper initialization by calling the parent class method
         await super().process_frame(frame, direction)
         
         if direction == FrameDirection.DOWNSTREAM:
-            # Read data only once
-            if not hasattr(self, 'df'):
+            # Open the streaming reader only once
+            if self.reader is None:
                 try:
-                    self.df = pd.read_csv(self.file_path)
-                    if 'text' not in self.df.columns:
-                        raise ValueError("CSV file must contain a 'text' column.")
-                    self.df['processed_text'] = self.df['text'].apply(lambda x: preprocess_text(x))
+                    self.reader = CsvStreamReader(self.file_path, normalizer.normalize_many, self.chunksize)
                 except Exception as e:
                     print(f"Error reading CSV: {e}")
                     return
             
             # Push the rows one by one
-            if len(self.df) > 0:
-                row = self.df.iloc[0]  # Get the first row
-                self.df = self.df.iloc[1:]  # Remove the first row from the DataFrame
-
-                frame.metadata["text"] = row["text"]
-                frame.metadata["processed_text"] = row["processed_text"]
+            try:
+                row = self.reader.next_row()  # Advance the cursor by one row
+            except Exception as e:
+                print(f"Error reading CSV: {e}")
+                return
+
+            if row is not None:
+                frame.metadata["text"], frame.metadata["processed_text"] = row
                 
             else:
                 print("No more data to process.")
                 
         await self.push_frame(frame, direction)
 
+    def read_rows(self, n):
+        """
+        Pulls the next n (text, processed_text) rows at once, fewer only at the end of the file.
+        """
+        if self.reader is None:
+            self.reader = CsvStreamReader(self.file_path, normalizer.normalize_many, self.chunksize)
+        return self.reader.next_rows(n)
+
+
+# Shared with the other pipelines; normalize_many cleans a whole chunk in one pass
+normalizer = TextNormalizer()
+
 
 def preprocess_text(text):
     """
     Preprocesses the input text by removing special characters and converting to lowercase.
     """
-    # Remove special characters (keeping only letters, digits, and spaces)
-    cleaned_text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-    # Convert text to lowercase
-    cleaned_text = cleaned_text.lower()
-    return cleaned_text
+    # Remove special characters (keeping only letters, digits, and spaces), then lowercase
+    return normalizer.normalize(text)
 
 
 # Step 2: Sentiment Analysis Processor with Updated Model
+def load_classifier():
+    # Using a model that distinguishes between 5 sentiment categories (one to five stars)
+    return shared_pipeline(MULTILINGUAL_STARS)
+
+
 class SentimentAnalysisProcessor(FrameProcessor):
-    def __init__(self):
+    def __init__(self, executor=None):
         super().__init__()
-        # Using a model that distinguishes between 5 sentiment categories
-        self.classifier = pipeline(
-            "sentiment-analysis",
-            model="nlptown/bert-base-multilingual-uncased-sentiment",
-            tokenizer="nlptown/bert-base-multilingual-uncased-sentiment"
-        )
-    
+        # With an InferenceExecutor the model is built and run in its thread/process pool instead
+        self.executor = executor
+        self.classifier = LazyModel(load_classifier) if executor is None else None  # Built on first use
+
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         # Ensure proper initialization by calling the parent class method
         await super().process_frame(frame, direction)
 
         if direction == FrameDirection.DOWNSTREAM:
             text = frame.metadata.get("processed_text", "")
-            result = self.classifier(text)[0]
-            sentiment_score = result["label"]
-
-            # Map the sentiment labels to human-readable categories
-            sentiment_map = {
-                '0': 'very negative',
-                '1': 'negative',
-                '2': 'neutral',
-                '3': 'positive',
-                '4': 'very positive'
-            }
-            
-            sentiment = sentiment_map.get(sentiment_score, 'unknown')
-            frame.metadata["sentiment"] = sentiment
+            result = (await self._classify(text))[0]
+
+            # Map the star ratings ("1 star" .. "5 stars") to human-readable categories
+            frame.metadata["sentiment"] = model_spec(MULTILINGUAL_STARS).sentiment(result)
             frame.metadata["score"] = result["score"]
         
         await self.push_frame(frame, direction)
 
+    async def _classify(self, text):
+        # Keep the blocking model call off the event loop when an executor is configured
+        if self.executor is not None:
+            return await self.executor.run(text)
+        return self.classifier(text)
+
 
 # Step 3: Setting Up the Complete Pipeline
 class SentimentPipeline(BasePipeline):
-    def __init__(self, file_path):
+    def __init__(self, file_path, executor=None):
         super().__init__()
         
         # Initialize processors
         self._data_reader = DataReadingProcessor(file_path)
-        self._sentiment_processor = SentimentAnalysisProcessor()
+        self._sentiment_processor = SentimentAnalysisProcessor(executor)
         
         # Set processors
         self._processors = [self._data_reader, self._sentiment_processor]
@@ -117,24 +132,26 @@ async def run_sentiment_analysis():
     file_path = 'input_data.csv'  # Replace with the actual file path
     output_file_path = 'output_results.csv'
     
-    # Initialize the pipeline with the file path
-    pipeline = SentimentPipeline(file_path)
+    # Run the model in a worker thread so it doesn't block the event loop
+    with InferenceExecutor(load_classifier) as executor:  # Shut down however the run ends
+        # Initialize the pipeline with the file path
+        pipeline = SentimentPipeline(file_path, executor)
     
-    # Process data using the pipeline
-    results = []
-    while True:
-        frame = Frame()
-        await pipeline.process_frame(frame, FrameDirection.DOWNSTREAM)
+        # Process data using the pipeline
+        results = []
+        while True:
+            frame = Frame()
+            await pipeline.process_frame(frame, FrameDirection.DOWNSTREAM)
         
-        # If the frame doesn't have any more data, break the loop
-        if 'text' not in frame.metadata:
-            break
-
-        # Output results for each line
-        sentiment = frame.metadata['sentiment']
-        score = frame.metadata['score']
-        text = frame.metadata['text']
-        results.append({"text": text, "sentiment": sentiment, "score": score})
+            # If the frame doesn't have any more data, break the loop
+            if 'text' not in frame.metadata:
+                break
+
+            # Output results for each line
+            sentiment = frame.metadata['sentiment']
+            score = frame.metadata['score']
+            text = frame.metadata['text']
+            results.append({"text": text, "sentiment": sentiment, "score": score})
 
     # Saving results to CSV
     try:
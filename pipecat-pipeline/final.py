@@ -1,23 +1,41 @@
+import argparse # For command-line options
 import asyncio # For handling asynchronous operations
-import pandas as pd # For data manipulation
-from pipecat.frames.frames import Frame # For creating and managing frames/Data Containers
+from collections import deque # For keeping frames in input order while they wait for their batch
+from functools import partial # For passing settings to the model factory
+from pipecat.frames.frames import EndFrame, Frame # For creating and managing frames/Data Containers, and marking the end of the data
 from pipecat.pipeline.base_pipeline import BasePipeline # For creating a pipeline
 from pipecat.processors.frame_processor import FrameProcessor, FrameDirection # For creating custom processors/ Procressing containers
-from transformers import pipeline # For using the sentiment analysis model
-import re # For regular expressions
+import sys # For locating the shared sentiment_common package
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sentiment_common.backends import BACKENDS, backend_model_id # For quantized/ONNX inference
+from sentiment_common.cascade import CascadeClassifier # For answering obvious rows without the model
+from sentiment_common.checkpoint import Checkpoint # For resuming crashed runs
+from sentiment_common.inference import InferenceExecutor # For running the model off the event loop
+from sentiment_common.near_duplicates import NearDuplicateIndex # For scoring near-identical texts once
+from sentiment_common.postprocessing import ScoredBatch # For labelling whole batches with numpy
+from sentiment_common.readers import TextStreamReader # For streaming CSV/Parquet/Arrow/JSONL input in chunks
+from sentiment_common.registry import TWITTER_ROBERTA, model_spec, shared_pipeline # For load-once models and their label maps
+from sentiment_common.result_cache import ResultCache # For skipping the model on repeated texts
+from sentiment_common.startup import LazyModel, startup_timer # For fast startup
+from sentiment_common.text_normalization import TextNormalizer # For vectorized text cleaning
+from sentiment_common.tuning import describe_tuned, load_tuned_settings, set_torch_threads # For per-host tuned settings
+from sentiment_common.windowing import LONG_DOCUMENT_MODES, WindowedClassifier # For length-bucketed, length-capped batches
+from sentiment_common.writers import StreamingCsvWriter # For writing results as they come in
 
 """
-Every time the process_frame method is called:
+When the run method is called:
 
-It checks if data has to be loaded.
-Selects one row from the dataframe.
-It processes that row.
-Updates the frame using the processed data.
-Transfers the frame to the next processor.
+It opens the streaming reader (CSV, Parquet, Arrow IPC or JSONL, by file extension).
+Takes the rows from the reader's cursor one by one (the file is read in chunks, never all at once).
+Puts each processed row into a new frame.
+Transfers the frame to the next processor, waiting until it has been taken.
+Ends the stream with an EndFrame once the data runs out (or can't be read).
 
 The design allows for:
 
-Memory-efficient processing (a row at a time)
+Memory-efficient processing (a row at a time, with memory bounded by the chunk size)
 Error resilience
 Clean integration with other pipeline processors.
 Asynchronous operation.
@@ -26,37 +44,54 @@ Simple data flow control
 
 # Step 1: Data Reading and Preprocessing
 class DataReadingProcessor(FrameProcessor):
-    def __init__(self, file_path):
+    def __init__(self, file_path, chunksize=10_000, skip_rows=0):
         super().__init__() # Initialize the parent class
         self.file_path = file_path # Set the file path
+        self.chunksize = chunksize # Rows per chunk read from the CSV
+        self.skip_rows = skip_rows # Rows already scored by an earlier run (when resuming)
+        self.reader = None # Opened on the first frame
     
-    async def process_frame(self, frame: Frame, direction: FrameDirection):
-        await super().process_frame(frame, direction)
-        
-        if direction == FrameDirection.DOWNSTREAM:
-            # Read data only once
-            if not hasattr(self, 'df'):
-                try:
-                    self.df = pd.read_csv(self.file_path)
-                    if 'text' not in self.df.columns:
-                        raise ValueError("CSV file must contain a 'text' column.")
-                    self.df['processed_text'] = self.df['text'].apply(lambda x: preprocess_text(x))
-                except Exception as e:
-                    print(f"Error reading CSV: {e}")
-                    return
-            
-            # Push the rows one by one
-            if len(self.df) > 0:
-                row = self.df.iloc[0]  # Get the first row
-                self.df = self.df.iloc[1:]  # Remove the first row from the DataFrame
-
-                frame.metadata["text"] = row["text"]
-                frame.metadata["processed_text"] = row["processed_text"]
-                
-            else:
+    async def run(self):
+        """
+        Produces a frame per row, then an EndFrame. Each push returns only once the next processor has
+        taken the frame, so a full queue downstream holds the reader back (backpressure).
+        """
+        # Open the streaming reader only once
+        if self.reader is None:
+            try:
+                self.reader = TextStreamReader(self.file_path, normalizer.normalize_many, self.chunksize,
+                                               skip_rows=self.skip_rows)
+            except Exception as e:
+                print(f"Error reading input: {e}")
+                await self.push_frame(EndFrame(), FrameDirection.DOWNSTREAM)
+                return
+
+        # Push the rows one by one
+        while True:
+            try:
+                row = self.reader.next_row()  # Advance the cursor by one row
+            except Exception as e:
+                print(f"Error reading input: {e}")
+                break
+
+            if row is None:
                 print("No more data to process.")
-                
-        await self.push_frame(frame, direction)
+                break
+
+            frame = Frame()
+            frame.metadata["text"], frame.metadata["processed_text"] = row
+            await self.push_frame(frame, FrameDirection.DOWNSTREAM)
+
+        await self.push_frame(EndFrame(), FrameDirection.DOWNSTREAM)
+
+    def read_rows(self, n):
+        """
+        Pulls the next n (text, processed_text) rows at once, fewer only at the end of the file.
+        """
+        if self.reader is None:
+            self.reader = TextStreamReader(self.file_path, normalizer.normalize_many, self.chunksize,
+                                           skip_rows=self.skip_rows)
+        return self.reader.next_rows(n)
 
 
 
@@ -80,15 +115,58 @@ Capitalization information is lost.
 """
 
 
+# Shared with the other pipelines; normalize_many cleans a whole chunk in one pass
+normalizer = TextNormalizer()
+
+
 def preprocess_text(text):
     """
     Preprocesses the input text by removing special characters and converting to lowercase.
     """
-    # Remove special characters (keeping only letters, digits, and spaces)
-    cleaned_text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-    # Convert text to lowercase
-    cleaned_text = cleaned_text.lower()
-    return cleaned_text
+    # Remove special characters (keeping only letters, digits, and spaces), then lowercase
+    return normalizer.normalize(text)
+
+
+# Step 1b (optional): Near-Duplicate Folding
+class NearDuplicateProcessor(FrameProcessor):
+    def __init__(self, index):
+        super().__init__()
+        self.index = index # NearDuplicateIndex; its clusters last for the whole run
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if direction == FrameDirection.DOWNSTREAM and "processed_text" in frame.metadata:
+            # The cluster representative's text stands in for this one, so the sentiment
+            # processor's in-batch dedup and result cache score each cluster once
+            (text,), (cluster_id,) = self.index.canonicalize([frame.metadata["processed_text"]])
+            frame.metadata["processed_text"] = text
+            frame.metadata["cluster_id"] = cluster_id
+
+        await self.push_frame(frame, direction)
+
+
+# Step 1c: Bounded Hand-Off to the Analyzers
+class FrameQueue(FrameProcessor):
+    def __init__(self, maxsize, consumers, pending):
+        super().__init__()
+        self.queue = asyncio.Queue(maxsize) # Frames read but not yet taken by an analyzer
+        self.consumers = consumers # Analyzers taking frames from the queue; each gets its own EndFrame
+        self.pending = pending # Every frame handed on, in input order, for writing out once it is scored
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        # put() waits while the queue is full, which holds back the processors upstream
+        if isinstance(frame, EndFrame):
+            for _ in range(self.consumers):
+                await self.queue.put(frame)
+        elif direction == FrameDirection.DOWNSTREAM:
+            self.pending.append(frame)
+            await self.queue.put(frame)
+
+    async def get(self):
+        return await self.queue.get()
 
 
 """
@@ -105,39 +183,185 @@ Non-destructive: Adds to metadata without changing the original text.
 
 
 # Step 2: Sentiment Analysis Processor with Custom Score Filter
+MODEL_NAME = TWITTER_ROBERTA  # Its label map and neutral band are declared in sentiment_common.registry
+
+
+def load_classifier(max_batch_tokens=4096, backend='torch', max_length=512, long_documents='truncate',
+                    max_windows=None, threads=None):
+    """
+    Builds the Hugging Face sentiment pipeline (module-level so process pool workers can build their own copy).
+    Lists of texts are run in length-sorted batches of at most max_batch_tokens padded tokens.
+    No model input exceeds max_length tokens: longer texts are truncated, or with long_documents='window'
+    scored as overlapping windows (at most max_windows, batched across texts) whose scores are averaged.
+    transformers is only imported here, so startup and --help don't wait for it.
+    backend picks float32 torch, int8-quantized torch or ONNX Runtime (see sentiment_common.backends).
+    The weights come from the process-wide model registry, so every processor in a process shares one copy.
+    Returns a function from a list of texts to a ScoredBatch: the top labels and scores as numpy arrays.
+    threads, if given, sets torch's intra-op thread count in the process that builds the model.
+    """
+    set_torch_threads(threads)
+    return WindowedClassifier(shared_pipeline(MODEL_NAME, backend), max_length, long_documents,
+                              max_windows=max_windows, max_batch_tokens=max_batch_tokens).scored
+
+
 class SentimentAnalysisProcessor(FrameProcessor):
-    def __init__(self):
+    def __init__(self, max_batch_size=1, max_wait_ms=None, executor=None, cache=None, max_batch_tokens=4096,
+                 backend='torch', cascade=None, max_length=512, long_documents='truncate', max_windows=None):
         super().__init__()
-        self.classifier = pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment",
-            tokenizer="cardiffnlp/twitter-roberta-base-sentiment"
-        )
+        # With an InferenceExecutor the model lives in its thread/process pool instead.
+        # Otherwise it is built on the first frame that needs it, not at construction time.
+        self.executor = executor
+        self.classifier = LazyModel(partial(load_classifier, max_batch_tokens, backend, max_length, long_documents,
+                                            max_windows)) if executor is None else None
+        # Optional ResultCache: texts seen before skip the model entirely
+        self.cache = cache
+        # Optional CascadeClassifier: uncached texts the lexicon is confident about skip the model too.
+        # Both tiers' results are cached, so a repeated text skips the lexicon as well.
+        self.cascade = cascade
+        # Micro-batching: with max_batch_size > 1, frames are buffered until the
+        # batch is full or max_wait_ms has passed since the first buffered frame
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._buffer = []
+        self._flush_timer = None
+        self._dispatch_lock = asyncio.Lock()
+        self._last_batch = None  # Most recently dispatched batch task, used to keep batches in order
     
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         await super().process_frame(frame, direction)
 
-        if direction == FrameDirection.DOWNSTREAM:
+        if direction == FrameDirection.DOWNSTREAM and self.max_batch_size > 1:
+            # The end of the data flushes the batch and passes straight through
+            if isinstance(frame, EndFrame):
+                await self.flush()
+                await self.drain()
+                await self.push_frame(frame, direction)
+                return
+
+            self._buffer.append(frame)
+            if len(self._buffer) >= self.max_batch_size:
+                await self.flush()
+            elif self._flush_timer is None and self.max_wait_ms is not None:
+                self._flush_timer = asyncio.create_task(self._flush_after(self.max_wait_ms / 1000))
+            return
+
+        if direction == FrameDirection.DOWNSTREAM and not isinstance(frame, EndFrame):
             text = frame.metadata.get("processed_text", "")
-            result = self.classifier(text)[0]
-            sentiment = result["label"]
-            score = result["score"]
-
-            # Implement custom filter for neutral based on score
-            if 0.40 <= score <= 0.60:
-                sentiment = "neutral"
-            
-            # Map labels to human-readable form
-            if sentiment == "LABEL_0":
-                sentiment = "negative"
-            elif sentiment == "LABEL_2":
-                sentiment = "positive"
-
-            frame.metadata["sentiment"] = sentiment
-            frame.metadata["score"] = score
+            result = self.cache.get(text) if self.cache is not None else None
+            if result is not None and self.cascade is not None:
+                self.cascade.record(1, [])
+            if result is None:
+                route = self.cascade.route([text]) if self.cascade is not None else None
+                fresh = []
+                if route is None or route.model_texts:
+                    if self.executor is not None:
+                        fresh = (await self.executor.run([text])).results()
+                    else:
+                        fresh = self.classifier([text]).results()
+                if route is not None:
+                    result = self.cascade.merge(route, fresh)[0]
+                    self.cascade.record(0, [result])
+                else:
+                    result = fresh[0]
+                if self.cache is not None:
+                    self.cache.put(text, result)
+            annotate_frame(frame, model_spec(MODEL_NAME).sentiment(result), result["score"])
         
         await self.push_frame(frame, direction)
 
+    async def flush(self):
+        """
+        Classifies all buffered frames with a single model call and pushes them on in arrival order.
+        Cached texts and repeats within the batch are not sent to the model.
+        With an executor the call is only dispatched here; the frames are pushed once it completes.
+        """
+        if self._flush_timer is not None:
+            if self._flush_timer is not asyncio.current_task():
+                self._flush_timer.cancel()
+            self._flush_timer = None
+
+        frames, self._buffer = self._buffer, []
+        if not frames:
+            return
+
+        texts = [frame.metadata["processed_text"] for frame in frames]
+        cached = [self.cache.get(text) if self.cache is not None else None for text in texts]
+        # Each distinct uncached text goes to the model once
+        uncached = list(dict.fromkeys(text for text, result in zip(texts, cached) if result is None))
+        # With a cascade, only the texts the lexicon is unsure of (plus its validation sample) reach the model
+        route = self.cascade.route(uncached) if self.cascade is not None else None
+        model_texts = route.model_texts if route is not None else uncached
+        batch = (frames, texts, cached, uncached, route)
+
+        if self.executor is None:
+            fresh = self.classifier(model_texts) if model_texts else ScoredBatch([], [])
+            await self._push_batch(batch, fresh)
+            return
+
+        # Waits while max_in_flight batches are already running, which holds back the reader
+        async with self._dispatch_lock:
+            future = await self.executor.submit(model_texts) if model_texts else None
+            self._last_batch = asyncio.create_task(self._push_when_done(batch, future, self._last_batch))
+
+    async def drain(self):
+        """
+        Waits until every dispatched batch has been classified and pushed.
+        """
+        if self._last_batch is not None:
+            await self._last_batch
+
+    async def _push_when_done(self, batch, future, previous):
+        fresh = await future if future is not None else ScoredBatch([], [])
+        # Batches may finish out of order; push them in the order they were dispatched
+        if previous is not None:
+            await previous
+        await self._push_batch(batch, fresh)
+
+    async def _push_batch(self, batch, fresh):
+        """
+        Labels a dispatched batch and pushes its frames. fresh is the model's ScoredBatch for the batch's model texts.
+        """
+        frames, texts, cached, uncached, route = batch
+        hits = [result for result in cached if result is not None]
+        position = {text: index for index, text in enumerate(uncached)}
+        if route is not None:
+            # The validation sample keeps its lexicon result, so every text is cached with the result it was given
+            merged = self.cascade.merge(route, fresh.results())
+            self.cascade.record(len(hits), [merged[position[text]] for text, result in zip(texts, cached)
+                                            if result is None])
+            fresh = ScoredBatch.from_results(merged)
+            if self.cache is not None:
+                for text, result in zip(uncached, merged):
+                    self.cache.put(text, result)
+        elif self.cache is not None:
+            for text, result in zip(uncached, fresh.results()):
+                self.cache.put(text, result)
+
+        # Every frame's row in one array: fresh rows first, then the cache hits
+        if hits:
+            fresh = ScoredBatch.concatenate([fresh, ScoredBatch.from_results(hits)])
+        hit_index = iter(range(len(uncached), len(uncached) + len(hits)))
+        rows = fresh.take([position[text] if result is None else next(hit_index)
+                           for text, result in zip(texts, cached)])
+        sentiments = model_spec(MODEL_NAME).sentiments(rows)
+
+        for frame, sentiment, score in zip(frames, sentiments.tolist(), rows.scores.tolist()):
+            annotate_frame(frame, sentiment, score)
+            await self.push_frame(frame, FrameDirection.DOWNSTREAM)
+
+    async def _flush_after(self, delay):
+        await asyncio.sleep(delay)
+        await self.flush()
+
+
+def annotate_frame(frame, sentiment, score):
+    """
+    Stores a result on the frame; the sentiment already has the model's label map and neutral band
+    (declared in the registry) applied, by ModelSpec.sentiments() for a whole batch at once.
+    """
+    frame.metadata["sentiment"] = sentiment
+    frame.metadata["score"] = score
+
 """
 
 Key Features and Benefits: Asynchronous Processing.
@@ -145,91 +369,359 @@ Key Features and Benefits: Asynchronous Processing.
 To efficiently handle many frames, use async/await.
 Allows non-blocking processes, making it suitable for high-throughput systems.
 Custom Neutral Detection
-Introduces a criteria that classifies sentiment as neutral when the confidence score falls between 0.40 and 0.60.
+Introduces a criteria that classifies sentiment as neutral when the confidence score falls between 0.40 and 0.60
+(the band is declared with the model in sentiment_common.registry).
 Adds subtlety to the fundamental positive/negative categorization, increasing accuracy in ambiguous instances.
+Batched frames are labelled with numpy over the whole batch: one argmax over the probability matrix, the
+label map applied once per distinct label and the neutral band as one comparison, with no per-row dicts.
 Score Preservation
 The confidence score (score) is retained in the frame's metadata.
 Allows for additional analysis or filtering based on the model's confidence in its predictions.
 Human-readable labels
-Converts technical labels (LABEL_0, LABEL_1, LABEL_2) to simple, understandable phrases.
+Converts technical labels (LABEL_0, LABEL_1, LABEL_2) to simple, understandable phrases, using the label map
+the model registry declares for the model.
 Makes the output easier to understand and apply in subsequent applications.
 Non-Destructive Processing.
 Adds sentiment and a score to the frame's information without changing the original text.
-
+Micro-Batching
+With max_batch_size > 1, frames are buffered and classified with one model call per batch
+(flushed when the batch is full, after max_wait_ms, or when the data runs out).
+Batched frames are pushed on in the order they arrived.
+Token-Budget Batching
+Within a batch, texts are sorted by token length and split so that no sub-batch pads more than
+max_batch_tokens tokens; a short "ok" is never padded out to the length of a long review.
+Results are put back in the original order.
+Long Documents
+No model input is longer than --max-length tokens (512 by default; 128 suits tweet-length data), so the cost
+of a row is bounded. Longer texts are truncated, or with --long-documents window split into overlapping
+windows that are batched together with other texts' windows and averaged back into one result per text;
+--max-windows caps the windows per text.
+Result Cache
+With a ResultCache, each cleaned text is classified once: repeats are answered from memory (or the
+optional SQLite file kept between runs), and duplicates inside a batch share one model call.
+Off-Loop Inference
+With an InferenceExecutor, the blocking model call runs in a thread or process pool instead of on the event loop.
+Up to max_in_flight batches (by default 2, or one per worker when there are more workers) run at once while the reader keeps filling the next batch; when all slots
+are busy, dispatching waits, so reading never runs far ahead of inference.
+Producer/Consumer Frame Flow
+The reader is a producer: it pushes frames through near-duplicate folding into a FrameQueue of
+--queue-size frames, and --analyzers SentimentAnalysisProcessors consume it concurrently, each with its
+own micro-batch. Every push waits while the queue is full, so a slow model holds back the reader instead
+of letting frames pile up in memory. The end of the data is an EndFrame (one per analyzer), not a frame
+without text.
+Tuned Settings
+python -m sentiment_common.tuning <input> sweeps worker processes, torch threads and the token budget per
+batch on a sample of the input and saves the fastest for this host; later runs load it automatically
+(the token budget always, workers and threads with --executor process) unless --workers or
+--no-tuned-profile says otherwise.
+Fast Startup
+transformers/torch are imported and the model is built only when the first text needs classifying,
+so --help and bad input files fail fast. --startup-report prints how long the imports, tokenizer load,
+weight load and first inference took.
+CPU Backends
+--backend int8 runs the model with its Linear layers dynamically quantized to int8, and --backend onnx
+runs an ONNX export of it with ONNX Runtime (exported once and reused). Results are cached per backend.
+python -m sentiment_common.backends input_data.csv checks label agreement, score drift and throughput
+of each backend against eager torch.
+Cheap-First Cascade
+With --cascade-threshold, a vectorized lexicon scorer sees each uncached batch first and answers the rows it
+is at least that confident about; only the rest reach the model. Both tiers' answers are cached. The run
+reports the share of all rows each tier (result cache, lexicon, model) handled and, on a --cascade-validation-rate sample of lexicon rows also sent to the model, how often
+the two agree, so the threshold can be tuned against throughput.
+Near-Duplicate Folding
+With --near-duplicate-threshold, a NearDuplicateProcessor between the reader and the sentiment processor
+clusters near-identical cleaned texts (bot retries, templates with an order number swapped in) with
+MinHash/LSH. Each frame takes its cluster representative's text, so only the representative is scored and
+its result is copied to the rest; the output gets a cluster_id column and the run reports the rows and
+distinct texts that skipped inference.
 
 
 """
 
 # Step 3: Setting Up the Complete Pipeline
 class SentimentPipeline(BasePipeline):
-    def __init__(self, file_path):
+    def __init__(self, file_path, max_batch_size=1, max_wait_ms=None, executor=None, cache=None,
+                 max_batch_tokens=4096, skip_rows=0, backend='torch', cascade=None, max_length=512,
+                 long_documents='truncate', max_windows=None, near_duplicates=None, analyzers=1,
+                 queue_size=None):
         super().__init__()
         
+        # Frames in input order; each is written out once it and every frame before it have been scored
+        self.pending = deque()
+
         # Initialize processors
-        self._data_reader = DataReadingProcessor(file_path)
-        self._sentiment_processor = SentimentAnalysisProcessor()
+        self._data_reader = DataReadingProcessor(file_path, skip_rows=skip_rows)
+        # By default the queue holds two batches per analyzer, enough to keep each one busy
+        self._queue = FrameQueue(queue_size or 2 * max_batch_size * analyzers, analyzers, self.pending)
+        # Analyzers share the executor, cache and cascade; each builds its own batches
+        self._analyzers = [SentimentAnalysisProcessor(max_batch_size, max_wait_ms, executor, cache,
+                                                      max_batch_tokens, backend, cascade, max_length,
+                                                      long_documents, max_windows)
+                           for _ in range(analyzers)]
         
-        # Set processors
-        self._processors = [self._data_reader, self._sentiment_processor]
+        # Set processors; near-duplicate folding, when enabled, sits between reading and the queue
+        self._processors = [self._data_reader, self._queue]
+        if near_duplicates is not None:
+            self._processors.insert(1, NearDuplicateProcessor(near_duplicates))
         self._link_processors()
 
-    async def process_frame(self, frame: Frame, direction: FrameDirection):
-        await super().process_frame(frame, direction)
-        for processor in self._processors:
-            await processor.process_frame(frame, direction)
+    async def run(self, on_frame=None):
+        """
+        Reads the whole input while the analyzers score it, and returns once every frame has been scored.
+        on_frame is called after each frame an analyzer takes, e.g. to write out the finished results.
+        """
+        workers = [asyncio.create_task(self._analyze(analyzer, on_frame)) for analyzer in self._analyzers]
+        try:
+            await asyncio.gather(self._data_reader.run(), *workers)
+        finally:
+            # If a stage failed, the others would wait on the queue forever
+            for worker in workers:
+                worker.cancel()
+
+    async def _analyze(self, analyzer, on_frame):
+        # Takes frames until its EndFrame, which flushes the analyzer's last batch and waits for it
+        while True:
+            frame = await self._queue.get()
+            await analyzer.process_frame(frame, FrameDirection.DOWNSTREAM)
+            if isinstance(frame, EndFrame):
+                return
+            if on_frame is not None:
+                on_frame()
 
     def _link_processors(self):
         prev = self._processors[0]
         prev.set_parent(self)
+        for processor in self._processors[1:]:
+            prev.link(processor)
+            prev = processor
 
 """
 
 Input and Output files:
 
-Reads information from input_data.csv.
+Reads information from input_data.csv (or --input: a CSV, Parquet, Arrow IPC or JSONL file).
 Saves the results to output_results.csv.
 Pipeline Setup:
 The input file is used to initialize a sentiment analysis pipeline.
 Processing:
 Each piece of text (frame) is evaluated to determine its sentiment and confidence level.
-Stops when there is no more data to process.
+The reader puts frames into a bounded queue and --analyzers sentiment processors take them from it,
+so reading, scoring and writing overlap; when the queue is full the reader waits for the analyzers.
+Frames are classified in micro-batches, so results are collected once their batch has been scored,
+and written in input order whichever analyzer scored them.
+Stops at the EndFrame the reader sends when there is no more data: each analyzer flushes its last
+batch and the remaining results are written.
 Savings Results:
-Saves the findings (text, sentiment, and score) to a CSV file.
+Saves the findings (text, sentiment, and score) to a CSV file as they come in.
+Rows are appended to output_results.csv.part in buffered chunks (so memory stays bounded and
+partial output survives a crash), and the file is renamed to output_results.csv at the end.
 If something goes wrong, it prints either a success message or an error.
+Checkpoint and Resume:
+Every flush also records the input offset and the flushed output size in output_results.csv.ckpt.json.
+Running with --resume after a crash skips the rows that were already scored, trims the partial
+output back to the checkpoint and keeps appending, so the final file matches an uninterrupted run.
 
 """
 
 # Step 4: Run the Pipeline and Output Results
-async def run_sentiment_analysis():
-    file_path = 'input_data.csv'  # Replace with the actual file path
+async def run_sentiment_analysis(max_batch_size=16, max_wait_ms=50, executor_kind='thread',
+                                 inference_workers=1, max_in_flight=None, cache_size=100_000, cache_path=None,
+                                 max_batch_tokens=4096, flush_rows=1000, flush_interval=5.0, resume=False,
+                                 startup_report=False, backend='torch', file_path='input_data.csv',
+                                 cascade_threshold=None, cascade_validation_rate=0.05, max_length=512,
+                                 long_documents='truncate', max_windows=None, near_duplicate_threshold=None,
+                                 threads_per_worker=None, analyzers=1, queue_size=None):
+    # file_path may be CSV, Parquet, Arrow IPC or JSONL; only its text column is read
     output_file_path = 'output_results.csv'
     
-    # Initialize the pipeline with the file path
-    pipeline = SentimentPipeline(file_path)
+    # Pick up where a crashed run stopped, if asked to and a checkpoint exists
+    checkpoint = Checkpoint(output_file_path + '.ckpt.json', file_path)
+    state = checkpoint.load() if resume else None
+    if state is not None:
+        print(f"Resuming after {state['input_offset']} already scored rows")
+    else:
+        checkpoint.clear()
     
-    # Process data using the pipeline
-    results = []
-    while True:
-        frame = Frame()
-        await pipeline.process_frame(frame, FrameDirection.DOWNSTREAM)
-        
-        # If the frame doesn't have any more data, break the loop
-        if 'text' not in frame.metadata:
-            break
+    # Run inference in a thread/process pool so reading overlaps with the model.
+    # Unless set, enough batches are in flight to keep every worker busy (the tuner measured them all working)
+    if max_in_flight is None:
+        max_in_flight = max(2, inference_workers)
+    executor = InferenceExecutor(partial(load_classifier, max_batch_tokens, backend, max_length, long_documents,
+                                         max_windows, threads_per_worker), executor_kind,
+                                 inference_workers, max_in_flight)
+    # Duplicate feedback is classified once; cache_path keeps results between runs
+    # Long texts score differently when cut differently, so non-default settings get their own cache entries
+    model_id = backend_model_id(MODEL_NAME, backend)
+    if (max_length, long_documents) != (512, 'truncate'):
+        model_id += f"|{long_documents}:{max_length}:{max_windows}"
+    # The cache also holds the cascade's lexicon answers, which a run with another threshold (or none) must not reuse
+    if cascade_threshold is not None:
+        model_id += f"|cascade:{cascade_threshold}"
+    cache = ResultCache(model_id, cache_size, cache_path)
+
+    # With a cascade threshold, rows the lexicon scores at least that confidently skip the model
+    cascade = None
+    if cascade_threshold is not None:
+        spec = model_spec(MODEL_NAME)
+        # The lexicon answers in the model's own label names, so both tiers share one label map
+        cascade = CascadeClassifier(threshold=cascade_threshold,
+                                    labels={s: spec.raw_label(s) for s in ('negative', 'positive')},
+                                    validation_rate=cascade_validation_rate)
+
+    # With a near-duplicate threshold, each cluster of near-identical texts is scored once
+    near_duplicates = None
+    if near_duplicate_threshold is not None:
+        near_duplicates = NearDuplicateIndex(near_duplicate_threshold)
 
-        # Output results for each line
-        sentiment = frame.metadata['sentiment']
-        score = frame.metadata['score']
-        text = frame.metadata['text']
-        results.append({"text": text, "sentiment": sentiment, "score": score})
+    # Initialize the pipeline with the file path
+    skip_rows = state['input_offset'] if state is not None else 0
+    pipeline = SentimentPipeline(file_path, max_batch_size, max_wait_ms, executor, cache, max_batch_tokens,
+                                 skip_rows, backend, cascade, max_length, long_documents, max_windows,
+                                 near_duplicates, analyzers, queue_size)
+    
+    # Results are streamed to '<output>.part' in chunks and renamed once the run completes.
+    # Output rows match input rows one to one, so the rows flushed so far are also the input offset.
+    writer = StreamingCsvWriter(
+        output_file_path, ["text", "sentiment", "score"] + (["cluster_id"] if near_duplicates is not None else []),
+        flush_rows, flush_interval,
+        on_flush=lambda w: checkpoint.save(w.rows_written, w.rows_written, w.bytes_written),
+        resume_rows=skip_rows,
+        resume_bytes=state['output_bytes'] if state is not None else None,
+    )
+
+    # Process data using the pipeline: the reader fills a bounded queue that the analyzers drain,
+    # and scored frames are written out in input order as they become ready
+    # Leaving the block shuts the inference pool down, also on errors (live process workers would hold up exit)
+    with executor:
+        await pipeline.run(on_frame=lambda: collect_results(pipeline.pending, writer))
+        collect_results(pipeline.pending, writer)
+
+    stats = cache.stats()
+    print(f"Result cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+          f"{stats['misses']} misses, {stats['hit_rate']:.1%} hit rate")
+    cache.close()
+    if cascade is not None:
+        print(cascade.format_report())
+    if near_duplicates is not None:
+        print(near_duplicates.format_report())
+
+    # Process pool workers time their own startup, so only thread mode has phases to show here
+    if startup_report:
+        print(startup_timer.format_report())
 
     # Saving results to CSV
     try:
-        df = pd.DataFrame(results)
-        df.to_csv(output_file_path, index=False)
+        writer.close()
+        checkpoint.clear()
         print(f"Sentiment analysis results saved to {output_file_path}")
     except Exception as e:
         print(f"Error saving results to CSV: {e}")
 
+def collect_results(pending, writer):
+    """
+    Writes out frames that have been classified from the front of the pending queue.
+    """
+    while pending and 'sentiment' in pending[0].metadata:
+        frame = pending.popleft()
+
+        # Output results for each line
+        sentiment = frame.metadata['sentiment']
+        score = frame.metadata['score']
+        text = frame.metadata['text']
+        row = {"text": text, "sentiment": sentiment, "score": score}
+        if 'cluster_id' in frame.metadata:
+            row["cluster_id"] = frame.metadata['cluster_id']
+        writer.write(row)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run sentiment analysis over a feedback file")
+    parser.add_argument("--input", default="input_data.csv",
+                        help="input file: CSV, Parquet, Arrow IPC (.arrow/.feather) or JSONL, by extension")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue a crashed run from its checkpoint instead of starting over")
+    parser.add_argument("--batch-size", type=int, default=16, help="frames per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=50, help="longest a partial batch waits")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="where inference runs")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="CPU inference backend: float32 torch, int8-quantized torch, ONNX Runtime, or a no-model stub")
+    parser.add_argument("--cascade-threshold", type=float, default=None,
+                        help="answer rows whose lexicon confidence (0.5-1) is at least this without the model")
+    parser.add_argument("--cascade-validation-rate", type=float, default=0.05,
+                        help="share of lexicon-answered rows also sent to the model to measure agreement")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=None,
+                        help="score one text per cluster of near-identical texts (MinHash/LSH, estimated Jaccard "
+                             "similarity at least this); adds a cluster_id column")
+    parser.add_argument("--max-length", type=int, default=512,
+                        help="most tokens per model input, e.g. 128 for tweet-length data")
+    parser.add_argument("--long-documents", choices=LONG_DOCUMENT_MODES, default="truncate",
+                        help="texts over --max-length: keep their first tokens, or score overlapping windows "
+                             "(batched across texts) and average them")
+    parser.add_argument("--max-windows", type=int, default=None,
+                        help="with --long-documents window, most windows per text, evenly spread (caps per-row cost)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="inference pool size (default: with --executor process, this host's tuned profile; else 1)")
+    parser.add_argument("--no-tuned-profile", action="store_true",
+                        help="ignore the settings python -m sentiment_common.tuning saved for this host")
+    parser.add_argument("--tuning-dir", default=None,
+                        help="load the tuned profile from this directory (as given to sentiment_common.tuning)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="batches queued or running at once (default: 2, or the worker count if higher)")
+    parser.add_argument("--analyzers", type=int, default=1,
+                        help="sentiment processors taking frames from the reader's queue, each batching on its own")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="frames read ahead of the analyzers before the reader waits (default: two batches each)")
+    parser.add_argument("--cache-db", default=None, help="SQLite file that keeps cached results between runs")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long imports, tokenizer load, weight load and first inference took")
+    args = parser.parse_args()
+    if args.near_duplicate_threshold is not None and not 0 < args.near_duplicate_threshold <= 1:
+        parser.error("--near-duplicate-threshold must be in (0, 1]")
+    if args.resume and args.near_duplicate_threshold is not None:
+        # The clusters aren't checkpointed, so resumed rows would reuse cluster ids already written
+        parser.error("--resume can't restore near-duplicate clusters; rerun with --near-duplicate-threshold "
+                     "from the start")
+    return args
+
+def tuned_settings(args):
+    """
+    This host's tuned profile, as far as it applies: the token budget always, worker processes and
+    their torch threads only with --executor process (a thread pool shares one model, which is not
+    what the tuner measured) and only where --workers wasn't given.
+    """
+    tuned = None if args.no_tuned_profile else load_tuned_settings(MODEL_NAME, args.backend, args.tuning_dir)
+    settings = {'inference_workers': args.workers or 1, 'max_batch_tokens': 4096, 'threads_per_worker': None}
+    if tuned is None:
+        return settings
+    applied = ['max_batch_tokens']
+    settings['max_batch_tokens'] = tuned['max_batch_tokens']
+    if args.executor == 'process' and args.workers is None:
+        applied += ['workers', 'threads_per_worker']
+        settings['inference_workers'] = tuned['workers']
+        settings['threads_per_worker'] = tuned['threads_per_worker']
+    print(describe_tuned(tuned, applied))
+    return settings
+
 # Run the pipeline
-asyncio.run(run_sentiment_analysis())
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(run_sentiment_analysis(
+        **tuned_settings(args),
+        max_batch_size=args.batch_size,
+        max_wait_ms=args.max_wait_ms,
+        executor_kind=args.executor,
+        max_in_flight=args.max_in_flight,
+        cache_path=args.cache_db,
+        resume=args.resume,
+        startup_report=args.startup_report,
+        backend=args.backend,
+        file_path=args.input,
+        cascade_threshold=args.cascade_threshold,
+        cascade_validation_rate=args.cascade_validation_rate,
+        max_length=args.max_length,
+        long_documents=args.long_documents,
+        max_windows=args.max_windows,
+        near_duplicate_threshold=args.near_duplicate_threshold,
+        analyzers=args.analyzers,
+        queue_size=args.queue_size,
+    ))
@@ -0,0 +1,331 @@
+import argparse
+import os
+import time
+import zlib
+from array import array
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .startup import load_sentiment_pipeline, startup_timer
+
+# 'torch': the float32 transformers pipeline; 'int8': the same model with its Linear
+# layers dynamically quantized to int8; 'onnx': the model exported to ONNX and run
+# with ONNX Runtime. All three are CPU backends and return pipeline-shaped results.
+# 'stub' needs no model at all (see StubSentimentClassifier) and is meant for benchmarks
+# and dry runs of the pipelines.
+BACKENDS = ('torch', 'int8', 'onnx', 'stub')
+MODEL_BACKENDS = ('torch', 'int8', 'onnx')
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sentiment_common', 'onnx')
+
+
+def backend_model_id(model_name: str, backend: str) -> str:
+    """Model id for result caches; quantized backends can score slightly differently, so they get their own."""
+    return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+
+def load_backend_pipeline(model_name: str, backend: str = 'torch', onnx_dir: Optional[str] = None,
+                          **pipeline_kwargs):
+    """Builds a sentiment classifier for model_name (a hub id or a local checkpoint) on the given backend.
+
+    The result is called like a transformers sentiment-analysis pipeline and returns the
+    same label/score dicts. pipeline_kwargs (e.g. return_all_scores=True) are honoured by
+    every backend. The ONNX export is written once under onnx_dir and reused afterwards.
+    """
+    if backend == 'torch':
+        return load_sentiment_pipeline(model_name, **pipeline_kwargs)
+    if backend == 'int8':
+        return _load_int8_pipeline(model_name, **pipeline_kwargs)
+    if backend == 'onnx':
+        return _load_onnx_classifier(model_name, onnx_dir, **pipeline_kwargs)
+    if backend == 'stub':
+        return StubSentimentClassifier(**pipeline_kwargs)
+    raise ValueError(f"Unknown backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def _load_int8_pipeline(model_name: str, **pipeline_kwargs):
+    with startup_timer.phase("imports"):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    with startup_timer.phase("tokenizer load"):
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    with startup_timer.phase("weight load"):
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    with startup_timer.phase("quantization"):
+        # Weights are stored as int8 and activations quantized on the fly, which is where
+        # nearly all of a RoBERTa/BERT classifier's CPU time goes
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, **pipeline_kwargs)
+
+
+def onnx_export_dir(model_name: str, onnx_dir: Optional[str] = None) -> str:
+    safe_name = model_name.strip('/').replace('/', '__').replace(os.sep, '__')
+    return os.path.join(onnx_dir or DEFAULT_ONNX_DIR, safe_name)
+
+
+def export_onnx(model_name: str, output_dir: str, opset_version: int = 14) -> str:
+    """Exports model_name to output_dir/model.onnx, next to its tokenizer and config, and returns the file path.
+
+    Batch size and sequence length are dynamic axes. The file is written under a
+    temporary name and renamed at the end, so an interrupted export is never reused.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    model.config.return_dict = False  # Export plain logits instead of an output object
+
+    os.makedirs(output_dir, exist_ok=True)
+    onnx_path = os.path.join(output_dir, 'model.onnx')
+    sample = tokenizer(["an example sentence to trace the model"], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            onnx_path + '.tmp',
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'},
+            },
+            opset_version=opset_version,
+        )
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    os.replace(onnx_path + '.tmp', onnx_path)
+    return onnx_path
+
+
+def _load_onnx_classifier(model_name: str, onnx_dir: Optional[str] = None, **pipeline_kwargs):
+    with startup_timer.phase("imports"):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The 'onnx' backend needs onnxruntime (pip install onnxruntime onnx)") from e
+        from transformers import AutoConfig, AutoTokenizer
+
+    export_dir = onnx_export_dir(model_name, onnx_dir)
+    onnx_path = os.path.join(export_dir, 'model.onnx')
+    if not os.path.exists(onnx_path):
+        with startup_timer.phase("onnx export"):
+            export_onnx(model_name, export_dir)
+    with startup_timer.phase("tokenizer load"):
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    with startup_timer.phase("weight load"):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        labels = AutoConfig.from_pretrained(export_dir).id2label
+    return OnnxSentimentClassifier(session, tokenizer, labels, **pipeline_kwargs)
+
+
+class OnnxSentimentClassifier:
+    """Runs an exported sequence classifier with ONNX Runtime, returning what the transformers pipeline would.
+
+    Calling it with a string or a list of strings gives one {'label', 'score'} dict per
+    text (the softmax top class, taken from each batch's logits at once by
+    ScoredBatch.from_logits), or with return_all_scores=True the full list of label
+    scores per text. batch_size texts are padded and run together.
+    """
+
+    def __init__(self, session, tokenizer, id2label: Dict[int, str], return_all_scores: bool = False,
+                 batch_size: int = 1):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.id2label = {int(index): label for index, label in id2label.items()}
+        self.return_all_scores = return_all_scores
+        self.batch_size = batch_size
+
+    def __call__(self, inputs, batch_size: Optional[int] = None, truncation: bool = False,
+                 max_length: Optional[int] = None, **kwargs) -> List[Any]:
+        from .postprocessing import ScoredBatch  # postprocessing imports softmax from here
+
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or self.batch_size
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=truncation,
+                                     max_length=max_length, return_tensors='np')
+            logits = self.logits(encoded['input_ids'], encoded['attention_mask'])
+            if self.return_all_scores:
+                results.extend([{'label': self.id2label[index], 'score': float(score)}
+                                for index, score in enumerate(row)] for row in softmax(logits))
+            else:
+                results.extend(ScoredBatch.from_logits(logits, self.id2label).results())
+        return results
+
+    def logits(self, input_ids, attention_mask):
+        """The model's raw logits (rows x labels) for already tokenized, padded input."""
+        import numpy as np
+
+        return self.session.run(['logits'], {
+            'input_ids': np.asarray(input_ids, dtype=np.int64),
+            'attention_mask': np.asarray(attention_mask, dtype=np.int64),
+        })[0]
+
+    def probabilities(self, input_ids, attention_mask):
+        """Label probabilities (rows x labels) for already tokenized, padded input."""
+        return softmax(self.logits(input_ids, attention_mask))
+
+
+def softmax(logits):
+    import numpy as np
+
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def token_probabilities(classifier, input_ids, attention_mask) -> Tuple[Any, Dict[int, str]]:
+    """Runs a classifier from load_backend_pipeline() on already tokenized, padded input.
+
+    Skips the tokenizer entirely (e.g. for input from a TokenCache). Returns the label
+    probabilities (a rows x labels numpy array, softmaxed as the pipeline would) and the
+    index-to-label mapping.
+    """
+    from .startup import LazyModel
+
+    if isinstance(classifier, LazyModel):
+        classifier = classifier.model
+    if hasattr(classifier, 'probabilities'):
+        return classifier.probabilities(input_ids, attention_mask), classifier.id2label
+
+    # A transformers pipeline (float32 or int8): call its model directly
+    import torch
+
+    with torch.no_grad():
+        logits = classifier.model(input_ids=torch.as_tensor(input_ids, dtype=torch.long),
+                                  attention_mask=torch.as_tensor(attention_mask, dtype=torch.long)).logits
+    return softmax(logits.float().numpy()), classifier.model.config.id2label
+
+
+class _WordHashTokenizer:
+    model_max_length = 512
+
+    def __call__(self, texts, truncation: bool = False, max_length: Optional[int] = None,
+                 add_special_tokens: bool = True, **kwargs) -> Dict[str, List[List[int]]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        # One id per word; ids are word hashes, so equal texts give equal ids
+        ids = [[3 + zlib.crc32(word.encode('utf-8')) % 50_000 for word in text.split()] for text in texts]
+        if truncation:
+            limit = (max_length or self.model_max_length) - (self.num_special_tokens_to_add() if add_special_tokens else 0)
+            ids = [row[:limit] for row in ids]
+        if add_special_tokens:
+            ids = [self.build_inputs_with_special_tokens(row) for row in ids]
+        return {'input_ids': ids, 'attention_mask': [[1] * len(row) for row in ids]}
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids: List[int]) -> List[int]:
+        # <s> ... </s>
+        return [0] + list(ids) + [2]
+
+
+class StubSentimentClassifier:
+    """Deterministic stand-in for a sentiment pipeline: no model, no downloads, near-zero cost.
+
+    The label scores are derived from a CRC32 of the token ids (word hashes), so the
+    same text always gets the same result, whether it arrives as text or pre-tokenized.
+    Benchmarks use it to measure the pipelines' own overhead.
+    """
+
+    labels = ('LABEL_0', 'LABEL_1', 'LABEL_2')
+    id2label = dict(enumerate(labels))
+
+    def __init__(self, return_all_scores: bool = False, **kwargs):
+        self.return_all_scores = return_all_scores
+        self.tokenizer = _WordHashTokenizer()
+
+    def __call__(self, inputs, **kwargs) -> List[Any]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        return [self._format(self._scores(ids)) for ids in self.tokenizer(texts)['input_ids']]
+
+    def probabilities(self, input_ids, attention_mask):
+        import numpy as np
+
+        return np.array([self._scores(row[mask != 0].tolist()) for row, mask in zip(input_ids, attention_mask)])
+
+    def _scores(self, ids: List[int]) -> List[float]:
+        digest = zlib.crc32(array('i', ids).tobytes())
+        weights = [1 + (digest >> shift) % 97 for shift in (0, 8, 16)]
+        total = sum(weights)
+        return [weight / total for weight in weights]
+
+    def _format(self, scores: List[float]) -> Any:
+        if self.return_all_scores:
+            return [{'label': label, 'score': score} for label, score in zip(self.labels, scores)]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return {'label': self.labels[best], 'score': scores[best]}
+
+
+def compare_backends(model_name: str, texts: Sequence[str], backends: Sequence[str] = MODEL_BACKENDS,
+                     batch_size: int = 32, onnx_dir: Optional[str] = None,
+                     max_length: int = 512) -> Dict[str, Dict[str, float]]:
+    """Scores texts with every backend and compares each one against eager torch.
+
+    Texts are truncated to max_length tokens, as the pipelines do, so long rows don't
+    overflow the model's position embeddings.
+
+    For each backend (torch is always included as the reference), reports texts per
+    second, the speedup over torch, the share of texts whose top label matches torch,
+    and the mean and max absolute difference of the per-label scores.
+    """
+    texts = list(texts)
+    scores: Dict[str, List[Dict[str, float]]] = {}
+    report: Dict[str, Dict[str, float]] = {}
+    for backend in ['torch'] + [b for b in backends if b != 'torch']:
+        classifier = load_backend_pipeline(model_name, backend, onnx_dir, return_all_scores=True)
+        call = partial(classifier, batch_size=batch_size, truncation=True, max_length=max_length)
+        call(texts[:batch_size])  # Warm-up, not timed
+        start = time.perf_counter()
+        outputs = call(texts)
+        elapsed = time.perf_counter() - start
+        scores[backend] = [{item['label']: item['score'] for item in output} for output in outputs]
+        report[backend] = {'texts_per_sec': len(texts) / elapsed if elapsed > 0 else float('inf')}
+
+    reference = scores['torch']
+    for backend, backend_scores in scores.items():
+        agree = 0
+        drifts = []
+        for expected, actual in zip(reference, backend_scores):
+            agree += max(expected, key=expected.get) == max(actual, key=actual.get)
+            drifts.extend(abs(expected[label] - actual[label]) for label in expected)
+        report[backend]['label_agreement'] = agree / len(texts) if texts else 1.0
+        report[backend]['mean_score_drift'] = sum(drifts) / len(drifts) if drifts else 0.0
+        report[backend]['max_score_drift'] = max(drifts, default=0.0)
+        report[backend]['speedup'] = report[backend]['texts_per_sec'] / report['torch']['texts_per_sec']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU inference backends against eager torch")
+    parser.add_argument("input", help="CSV file with a 'text' column to score")
+    parser.add_argument("--model", default="cardiffnlp/twitter-roberta-base-sentiment-latest",
+                        help="hub id or local checkpoint directory")
+    parser.add_argument("--backends", nargs='+', choices=BACKENDS, default=list(MODEL_BACKENDS))
+    parser.add_argument("--rows", type=int, default=1000, help="texts taken from the top of the file")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=512, help="most tokens per text (longer texts are truncated)")
+    parser.add_argument("--onnx-dir", default=None, help=f"where ONNX exports are kept (default {DEFAULT_ONNX_DIR})")
+    args = parser.parse_args()
+
+    from .readers import CsvStreamReader
+
+    reader = CsvStreamReader(args.input, lambda texts: texts, args.rows)
+    texts = [str(text) for text, _ in reader.next_rows(args.rows)]
+    reader.close()
+
+    report = compare_backends(args.model, texts, args.backends, args.batch_size, args.onnx_dir, args.max_length)
+    print(f"{len(texts)} texts, batch size {args.batch_size}")
+    print(f"{'backend':<8}{'texts/s':>10}{'speedup':>9}{'agreement':>11}{'mean drift':>12}{'max drift':>11}")
+    for backend, row in report.items():
+        print(f"{backend:<8}{row['texts_per_sec']:>10.1f}{row['speedup']:>8.2f}x{row['label_agreement']:>10.1%}"
+              f"{row['mean_score_drift']:>12.4f}{row['max_score_drift']:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
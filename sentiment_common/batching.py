@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+# Tells the DynamicBatcher thread to finish up
+_STOP = object()
+
+
+def token_budget_batches(lengths: Sequence[int], max_batch_tokens: int,
+                         max_batch_size: Optional[int] = None) -> List[List[int]]:
+    """Groups item indices into batches of similar length.
+
+    Items are sorted by length and cut into batches whose padded size (number of
+    items times the longest item) stays within max_batch_tokens, so short texts
+    are never padded out to the length of a long one. An item longer than the
+    budget on its own still gets a batch to itself.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    for index in order:
+        length = max(lengths[index], 1)
+        full = max_batch_size is not None and len(current) >= max_batch_size
+        if current and (full or max(longest, length) * (len(current) + 1) > max_batch_tokens):
+            batches.append(current)
+            current, longest = [], 0
+        current.append(index)
+        longest = max(longest, length)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class DynamicBatcher:
+    """Merges single items submitted from many threads into batched calls of fn.
+
+    fn takes a list of items and returns one result per item, in order (e.g. a
+    transformers pipeline). A batch closes when it holds max_batch_size items or
+    max_wait_ms has passed since its first item arrived, so a lone request waits at
+    most max_wait_ms. submit() returns a concurrent.futures.Future for the item's
+    result; if fn raises, or returns the wrong number of results, every item of that
+    batch gets the exception. Once close() has been called, submit() raises
+    RuntimeError.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 32, max_wait_ms: float = 10.0):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.items = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._submit_lock = threading.Lock()  # Nothing is queued behind _STOP
+        self._thread = threading.Thread(target=self._loop, name='dynamic-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("DynamicBatcher is closed")
+            self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(item).result(timeout)
+
+    def close(self) -> None:
+        """Finishes the items already submitted, then stops the batching thread."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._run(batch)
+        # Anything still queued behind _STOP is run too, so no caller is left waiting on its future
+        remaining = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                remaining.append(entry)
+        for start in range(0, len(remaining), self.max_batch_size):
+            self._run(remaining[start:start + self.max_batch_size])
+
+    def _run(self, batch) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = self.fn(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        results = list(results)
+        if len(results) != len(items):
+            # A short (or long) answer can't be matched to its items; fail them all rather than leave any waiting
+            error = RuntimeError(f"batch function returned {len(results)} results for {len(items)} items")
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.items += len(items)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,179 @@
+from itertools import chain, repeat
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Deliberately small and unambiguous: a word belongs here only if it almost always
+# carries the same sentiment in product feedback. Anything subtler goes to the model.
+POSITIVE_WORDS = (
+    "good great excellent amazing awesome fantastic wonderful brilliant superb outstanding perfect "
+    "love loved loves lovely like liked enjoy enjoyed happy pleased glad satisfied delighted impressed "
+    "helpful friendly kind polite fast quick quickly easy smooth simple reliable stable intuitive "
+    "recommend recommended best better nice thanks thank appreciate appreciated works worked fixed "
+    "efficient convenient responsive clean beautiful"
+).split()
+NEGATIVE_WORDS = (
+    "bad terrible awful horrible worst worse poor useless disappointing disappointed disappointment "
+    "hate hated hates annoying annoyed frustrating frustrated angry upset unhappy rude unhelpful "
+    "slow slowly broken broke crash crashed crashes crashing bug buggy glitch error errors fail failed "
+    "fails failure freeze froze frozen lag laggy late delayed missing lost refund scam waste wasted "
+    "confusing confused complicated difficult impossible expensive overpriced unusable unreliable "
+    "problem problems issue issues cancel cancelled"
+).split()
+# Flip the polarity of the next NEGATION_SPAN words ("not good", "never slow")
+NEGATORS = (
+    "not no never nothing nobody none neither nor hardly barely without "
+    "dont doesnt didnt isnt wasnt arent werent cant cannot couldnt wont wouldnt shouldnt havent hasnt "
+    "don't doesn't didn't isn't wasn't aren't weren't can't couldn't won't wouldn't shouldn't haven't hasn't"
+).split()
+NEGATION_SPAN = 2
+
+
+class LexiconScorer:
+    """Rule-based sentiment for already normalized (lowercase, punctuation-free) texts.
+
+    Each text gets a polarity p = (positive - negative) / (positive + negative + 1)
+    from its lexicon hits, with a negator flipping the next NEGATION_SPAN words, and a
+    confidence of 0.5 + |p| / 2: 0.5 with no evidence either way, approaching 1 as
+    the hits agree. score() works on a whole batch at once; the per-word work is one
+    dict lookup, the rest is numpy over the batch's concatenated words.
+    """
+
+    def __init__(self, positive: Iterable[str] = POSITIVE_WORDS, negative: Iterable[str] = NEGATIVE_WORDS,
+                 negators: Iterable[str] = NEGATORS, negation_span: int = NEGATION_SPAN):
+        self.polarity: Dict[str, int] = {word: 1 for word in positive}
+        self.polarity.update((word, -1) for word in negative)
+        self.negators = frozenset(negators)
+        self.negation_span = negation_span
+
+    def score(self, texts: Sequence[str]) -> Tuple[Any, Any]:
+        """Returns (polarity, confidence) arrays for texts; polarity > 0 means positive, < 0 negative."""
+        import numpy as np
+
+        words = [text.split() if isinstance(text, str) else [] for text in texts]
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        flat = list(chain.from_iterable(words))
+        # Which text each word belongs to
+        row = np.repeat(np.arange(len(words)), lengths)
+        polarity = np.fromiter(map(self.polarity.get, flat, repeat(0)), dtype=np.int8, count=len(flat))
+        negator = np.fromiter(map(self.negators.__contains__, flat), dtype=bool, count=len(flat))
+
+        flipped = np.zeros(len(flat), dtype=bool)
+        for offset in range(1, self.negation_span + 1):
+            # A negator affects the words after it within the same text only
+            flipped[offset:] ^= negator[:-offset] & (row[offset:] == row[:-offset])
+        polarity = np.where(flipped, -polarity, polarity)
+
+        positive = np.bincount(row, weights=polarity > 0, minlength=len(words))
+        negative = np.bincount(row, weights=polarity < 0, minlength=len(words))
+        p = (positive - negative) / (positive + negative + 1)
+        return p, 0.5 + np.abs(p) / 2
+
+
+class CascadeRoute:
+    """Where each text of one batch goes: results has the lexicon's answers (None where the model is needed)."""
+
+    def __init__(self, texts: List[str], results: List[Optional[Dict[str, Any]]],
+                 model_indices: List[int], validation_indices: List[int]):
+        self.results = results
+        self.model_indices = model_indices
+        self.validation_indices = validation_indices
+        # Uncertain texts, then the validation sample of confident ones
+        self.model_texts = [texts[i] for i in model_indices + validation_indices]
+
+
+class CascadeClassifier:
+    """Cheap-first classification: a LexiconScorer answers the rows it is confident about,
+    the model (any pipeline-like callable taking a list of texts) only the rest.
+
+    A text whose lexicon confidence is at least threshold gets {'label': ..., 'score':
+    confidence, 'tier': 'lexicon'} with label taken from labels (so it matches the
+    model's own label names); every other text goes to the model and its result is
+    returned as is. A validation_rate share of the confident rows is also sent to the
+    model, only to measure how often the two tiers agree; their lexicon result is kept,
+    so output doesn't depend on the sample.
+
+    Callers that run the model themselves (e.g. off the event loop) use route() and
+    merge() around their own model call instead of __call__(), then record() the
+    batch's rows, including the ones they answered from a result cache, so the report
+    gives each tier's share of all rows.
+    """
+
+    def __init__(self, model: Optional[Callable[[List[str]], List[Any]]] = None, threshold: float = 0.8,
+                 labels: Optional[Dict[str, str]] = None, validation_rate: float = 0.05,
+                 scorer: Optional[LexiconScorer] = None):
+        self.model = model
+        self.threshold = threshold
+        self.labels = {'negative': 'negative', 'positive': 'positive', **(labels or {})}
+        self.validation_rate = validation_rate
+        self.scorer = scorer or LexiconScorer()
+        self.rows = 0
+        self.cache_rows = 0
+        self.lexicon_rows = 0
+        self.validated = 0
+        self.agreed = 0
+        self._validation_credit = 0.0
+
+    def __call__(self, texts: Sequence[str]) -> List[Dict[str, Any]]:
+        route = self.route(texts)
+        results = self.merge(route, self.model(route.model_texts) if route.model_texts else [])
+        self.record(0, results)
+        return results
+
+    def route(self, texts: Sequence[str]) -> CascadeRoute:
+        texts = list(texts)
+        polarity, confidence = self.scorer.score(texts)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        model_indices, validation_indices = [], []
+        for index, (p, score) in enumerate(zip(polarity.tolist(), confidence.tolist())):
+            if score < self.threshold:
+                model_indices.append(index)
+                continue
+            results[index] = {'label': self.labels['positive' if p > 0 else 'negative'], 'score': score,
+                              'tier': 'lexicon'}
+            # Deterministic sampling: every 1/validation_rate-th confident row is checked
+            self._validation_credit += self.validation_rate
+            if self._validation_credit >= 1:
+                self._validation_credit -= 1
+                validation_indices.append(index)
+        return CascadeRoute(texts, results, model_indices, validation_indices)
+
+    def merge(self, route: CascadeRoute, model_results: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Fills route's uncertain rows with model_results (one per route.model_texts) and updates the agreement stats."""
+        results = list(route.results)
+        model_results = list(model_results)
+        for index, result in zip(route.model_indices, model_results):
+            results[index] = result
+        for index, result in zip(route.validation_indices, model_results[len(route.model_indices):]):
+            self.validated += 1
+            self.agreed += result['label'] == results[index]['label']
+        return results
+
+    def record(self, cache_rows: int, results: Sequence[Dict[str, Any]]) -> None:
+        """Counts a batch's rows: cache_rows answered from a result cache, plus one merged result per other row."""
+        self.rows += cache_rows + len(results)
+        self.cache_rows += cache_rows
+        self.lexicon_rows += sum(result.get('tier') == 'lexicon' for result in results)
+
+    def report(self) -> Dict[str, Any]:
+        """Rows handled by each tier (as shares of all rows), and top-label agreement on the validation sample."""
+        model_rows = self.rows - self.cache_rows - self.lexicon_rows
+        return {
+            'threshold': self.threshold,
+            'rows': self.rows,
+            'cache_rows': self.cache_rows,
+            'lexicon_rows': self.lexicon_rows,
+            'model_rows': model_rows,
+            'cache_share': self.cache_rows / self.rows if self.rows else 0.0,
+            'lexicon_share': self.lexicon_rows / self.rows if self.rows else 0.0,
+            'model_share': model_rows / self.rows if self.rows else 0.0,
+            'validation_rows': self.validated,
+            'agreement': self.agreed / self.validated if self.validated else None,
+        }
+
+    def format_report(self) -> str:
+        report = self.report()
+        agreement = (f"{report['agreement']:.1%} agreement with the model on {report['validation_rows']} sampled rows"
+                     if report['agreement'] is not None else "no rows sampled for validation")
+        return (f"Cascade (threshold {report['threshold']}): cache {report['cache_rows']} rows "
+                f"({report['cache_share']:.1%}), lexicon {report['lexicon_rows']} rows "
+                f"({report['lexicon_share']:.1%}), model {report['model_rows']} rows "
+                f"({report['model_share']:.1%}); {agreement}")
@@ -0,0 +1,46 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+
+class Checkpoint:
+    """Records how far a batch run has got so it can be resumed after a crash.
+
+    The state is the number of input rows already scored (input_offset) and the
+    row count and byte size of the output that had been flushed to disk at that
+    point. It is written atomically (temp file + rename) so a crash while saving
+    never leaves a torn checkpoint behind.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = str(path)
+        self.input_path = os.path.abspath(str(input_path))
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Returns the saved state, or None when there is nothing to resume."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('input_path') != self.input_path:
+            raise ValueError(f"Checkpoint {self.path} was written for {state.get('input_path')}, "
+                             f"not {self.input_path}")
+        return state
+
+    def save(self, input_offset: int, output_rows: int, output_bytes: int) -> None:
+        state = {
+            'input_path': self.input_path,
+            'input_offset': input_offset,
+            'output_rows': output_rows,
+            'output_bytes': output_bytes,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from .startup import startup_timer
+
+# Model instance owned by the current process pool worker (process mode only)
+_worker_model = None
+
+
+def _init_worker(model_factory: Callable[[], Callable]) -> None:
+    global _worker_model
+    _worker_model = model_factory()
+
+
+def _call_worker_model(args, kwargs):
+    return startup_timer.time_once("first inference", _worker_model, *args, **kwargs)
+
+
+class InferenceExecutor:
+    """Runs blocking model calls in a thread or process pool, off the asyncio event loop.
+
+    model_factory builds the model (e.g. a transformers pipeline). In thread mode it
+    is called once and the instance is shared by the pool threads; in process mode
+    every worker process builds its own copy, so it must be picklable (a module-level
+    function or a functools.partial of one). At most max_in_flight calls are queued or
+    running at once; submit() waits for a free slot, which pushes back on the caller.
+    Used as a context manager, the pool is shut down however the block exits (calls
+    not yet started are cancelled if it raised).
+    """
+
+    def __init__(self, model_factory: Callable[[], Callable], kind: str = 'thread',
+                 max_workers: int = 1, max_in_flight: int = 2):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind!r} (expected 'thread' or 'process')")
+        self.model_factory = model_factory
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self._pool: Executor = None
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def submit(self, *args, **kwargs) -> asyncio.Future:
+        """Starts a model call once an in-flight slot is free and returns a future for its result."""
+        await self._slots.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == 'process':
+                call = partial(_call_worker_model, args, kwargs)
+            else:
+                call = partial(self._call_shared_model, *args, **kwargs)
+            future = loop.run_in_executor(self._get_pool(), call)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, *args, **kwargs) -> Any:
+        """Runs one model call off the event loop and returns its result."""
+        return await (await self.submit(*args, **kwargs))
+
+    def shutdown(self, cancel_futures: bool = False) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=cancel_futures)
+            self._pool = None
+
+    def __enter__(self) -> 'InferenceExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.shutdown(cancel_futures=exc_type is not None)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == 'process':
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.model_factory,),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+        return self._pool
+
+    def _call_shared_model(self, *args, **kwargs):
+        # Built on first use inside a pool thread, so loading doesn't block the loop either
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self.model_factory()
+        return startup_timer.time_once("first inference", self._model, *args, **kwargs)
@@ -0,0 +1,145 @@
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+# Undetermined: no script or stopword evidence (empty, numeric or very short text)
+UNDETERMINED = 'und'
+
+# Non-Latin scripts name the language outright (Cyrillic is reported as 'ru', Arabic
+# script as 'ar' and Han without kana as 'zh'; the multilingual model covers them all
+# the same). Kana is checked before Han, so Japanese with kanji is still 'ja'.
+SCRIPTS = (
+    ('ja', '\u3040-\u30ff'),
+    ('zh', '\u4e00-\u9fff'),
+    ('ko', '\u1100-\u11ff\uac00-\ud7af'),
+    ('ru', '\u0400-\u04ff'),
+    ('el', '\u0370-\u03ff'),
+    ('ar', '\u0600-\u06ff'),
+    ('he', '\u0590-\u05ff'),
+    ('hi', '\u0900-\u097f'),
+    ('th', '\u0e00-\u0e7f'),
+)
+
+# Latin-script languages are told apart by their most frequent function words. Each
+# list keeps to words that are rare as words of the other languages listed here.
+STOPWORDS = {
+    'en': "the and is are was were this that with have has not but very for you it of to my they what would "
+          "could should been from just their your",
+    'es': "el los las del una unos que por para con muy pero está están también porque esto nada todo gracias "
+          "es mi",
+    'fr': "le les des une est sont avec pour pas très mais sur dans qui ce cette nous vous je il elle merci "
+          "au aux",
+    'de': "der die das und ist nicht sehr mit für auf ein eine ich sie wir aber auch zu den dem danke",
+    'it': "il lo gli della che non molto con per sono è ma anche questo questa grazie di nel",
+    'pt': "o os um uma não muito com para mas está são também obrigado você isso da",
+    'nl': "het een niet zeer met voor maar ook ik zijn wij dit dat bedankt heel van",
+}
+
+_WORD = re.compile(r"[^\W\d_]+")
+_LATIN = re.compile("[A-Za-z\u00c0-\u024f]")
+
+
+class LanguageDetector:
+    """Cheap offline language identification, good enough to pick a model.
+
+    No model or download is involved: text in a non-Latin script is identified by
+    its script, Latin-script text by counting the stopwords of each language in
+    STOPWORDS. The language needs at least min_hits stopwords and strictly more
+    than any other; otherwise (and for text with no letters) the result is
+    UNDETERMINED. Detection should see the raw text, before cleaning removes
+    accents and non-ASCII letters.
+    """
+
+    def __init__(self, stopwords: Optional[Dict[str, str]] = None, min_hits: int = 1):
+        self.min_hits = min_hits
+        self._language_of: Dict[str, List[str]] = {}
+        for language, words in (stopwords or STOPWORDS).items():
+            for word in words.split():
+                self._language_of.setdefault(word, []).append(language)
+        self._scripts = [(language, re.compile(f"[{characters}]")) for language, characters in SCRIPTS]
+
+    def detect(self, text: str) -> str:
+        if not isinstance(text, str) or not text:
+            return UNDETERMINED
+        if not text.isascii():
+            latin = len(_LATIN.findall(text))
+            for language, pattern in self._scripts:
+                # Mostly this script, not a Latin text quoting a word of it
+                if len(pattern.findall(text)) > latin:
+                    return language
+        hits = Counter()
+        for word in _WORD.findall(text.lower()):
+            hits.update(self._language_of.get(word, ()))
+        if not hits:
+            return UNDETERMINED
+        (best, count), *rest = hits.most_common(2)
+        if count < self.min_hits or (rest and rest[0][1] == count):
+            return UNDETERMINED
+        return best
+
+    def detect_many(self, texts: Iterable[str]) -> List[str]:
+        texts = texts.tolist() if hasattr(texts, 'tolist') else list(texts)
+        # Repeated texts (common in feedback data) are detected once
+        detected: Dict[str, str] = {}
+        languages = []
+        for text in texts:
+            language = detected.get(text) if isinstance(text, str) else None
+            if language is None:
+                language = self.detect(text)
+                if isinstance(text, str):
+                    detected[text] = language
+            languages.append(language)
+        return languages
+
+
+class LanguageRouter:
+    """Sends each row to the model for its language and puts the results back in input order.
+
+    routes maps a language code to a model id; the '*' entry, if present, takes
+    every other detected language. Undetermined text, and languages with no route,
+    go to default. assign() picks the model per row; run() then splits a batch into
+    one sub-batch per model, so each model is called (and batches) only with its own
+    rows, and merges the results.
+    """
+
+    def __init__(self, routes: Dict[str, str], default: str):
+        self.routes = dict(routes)
+        self.default = default
+        self.languages: Counter = Counter()
+        self.model_rows: Counter = Counter()
+
+    def model_for(self, language: str) -> str:
+        if language == UNDETERMINED:
+            return self.default
+        return self.routes.get(language) or self.routes.get('*') or self.default
+
+    def assign(self, languages: Sequence[str]) -> List[str]:
+        """The model id for each row's language; also counts the languages seen."""
+        languages = list(languages)
+        self.languages.update(languages)
+        return [self.model_for(language) for language in languages]
+
+    def run(self, texts: Sequence[str], models: Sequence[str],
+            classify: Callable[[List[str], str], Sequence[Any]]) -> List[Any]:
+        """classify(texts, model_id) once per model with that model's rows; returns results in the order of texts."""
+        texts = list(texts)
+        groups: Dict[str, List[int]] = {}
+        for index, model_id in enumerate(models):
+            groups.setdefault(model_id, []).append(index)
+        results: List[Any] = [None] * len(texts)
+        for model_id, indices in groups.items():
+            for index, result in zip(indices, classify([texts[i] for i in indices], model_id)):
+                results[index] = result
+            self.model_rows[model_id] += len(indices)
+        return results
+
+    def report(self) -> Dict[str, Any]:
+        """Rows per detected language, and rows each model actually scored (cache hits never reach a model)."""
+        return {'languages': dict(self.languages.most_common()), 'model_rows': dict(self.model_rows.most_common())}
+
+    def format_report(self) -> str:
+        total = sum(self.model_rows.values())
+        models = ', '.join(f"{model_id} {rows} rows ({rows / total:.1%})"
+                           for model_id, rows in self.model_rows.most_common())
+        languages = ', '.join(f"{language} {rows}" for language, rows in self.languages.most_common())
+        return f"Language routing: {models or 'no rows scored'}; detected {languages or 'nothing'}"
@@ -0,0 +1,171 @@
+import re
+import zlib
+from itertools import chain
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+# Permutations are a * x + b mod this Mersenne prime; products stay below 2**62, so uint64 never overflows
+_PRIME = (1 << 31) - 1
+_DIGITS = re.compile(r"\d+")
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows per band) for num_perm hashes that best separate pairs above and below threshold.
+
+    Picks the split whose collision curve 1 - (1 - s**rows)**bands has the least total
+    false positive (s < threshold) plus false negative (s >= threshold) area.
+    """
+    import numpy as np
+
+    similarity = np.linspace(0.0, 1.0, 201)
+    below = similarity < threshold
+    best, best_error = (num_perm, 1), None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        collision = 1 - (1 - similarity ** rows) ** bands
+        error = (collision[below].sum() + (1 - collision[~below]).sum()) / len(similarity)
+        if best_error is None or error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """Clusters near-identical texts with MinHash/LSH so each cluster is scored once.
+
+    A text's signature is the MinHash of its word shingles (shingle_size words, with
+    digit runs masked by default, so templates that only differ in an order number
+    or date count as the same text). LSH with banding finds earlier texts whose
+    signatures may match; a candidate joins a cluster only if the signatures agree on
+    at least threshold of their hashes (the estimated Jaccard similarity). The first
+    text of a cluster is its representative and stays the one every later member is
+    compared with, so clusters don't drift.
+
+    canonicalize() replaces each text with its cluster representative's text. Run
+    before the analyzer, that makes every member an exact repeat of the
+    representative, which the analyzers' in-batch dedup and the result cache already
+    score once. Clusters live across batches; past max_clusters the index starts
+    over (cluster ids keep counting up, so they stay unique within a run). The
+    members folded into a cluster are remembered only as CRC32s, for counting the
+    distinct texts not scored, and are dropped along with the cluster.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, shingle_size: int = 3,
+                 mask_digits: bool = True, max_clusters: int = 100_000, seed: int = 1):
+        import numpy as np
+
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.mask_digits = mask_digits
+        self.max_clusters = max_clusters
+        random = np.random.default_rng(seed)
+        self._a = random.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = random.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows_per_band = lsh_bands(threshold, num_perm)
+        self._buckets: List[Dict[bytes, int]] = [{} for _ in range(self.bands)]
+        self._representatives: Dict[int, Tuple[str, Any]] = {}
+        # Per cluster, CRC32s of the distinct texts folded into it; dropped with the cluster
+        self._folded: Dict[int, Set[int]] = {}
+        self._next_cluster = 0
+        self.rows = 0
+        self.near_duplicate_rows = 0
+        self.folded_texts = 0  # Distinct texts that took a representative's text, counted once per cluster
+
+    def signatures(self, texts: Sequence[str]) -> Any:
+        """The MinHash signature of each text, as a texts x num_perm uint64 array."""
+        import numpy as np
+
+        shingles = [self._shingle_hashes(text) for text in texts]
+        lengths = np.fromiter(map(len, shingles), dtype=np.int64, count=len(shingles))
+        if not len(shingles):
+            return np.zeros((0, self.num_perm), dtype=np.uint64)
+        hashes = np.fromiter(chain.from_iterable(shingles), dtype=np.uint64, count=int(lengths.sum()))
+        # Every text has at least one shingle, so each reduceat segment is non-empty
+        permuted = (hashes[:, None] * self._a + self._b) % _PRIME
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        return np.minimum.reduceat(permuted, starts, axis=0)
+
+    def assign(self, texts: Sequence[str]) -> List[int]:
+        """The cluster id of each text, creating a cluster (with the text as representative) where none matches."""
+        texts = list(texts)
+        clusters = []
+        for text, signature in zip(texts, self.signatures(texts)):
+            keys = [signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+                    for band in range(self.bands)]
+            cluster = self._match(signature, keys)
+            if cluster is None:
+                if len(self._representatives) >= self.max_clusters:
+                    self.clear()
+                cluster = self._next_cluster
+                self._next_cluster += 1
+                self._representatives[cluster] = (text, signature)
+                for bucket, key in zip(self._buckets, keys):
+                    bucket.setdefault(key, cluster)
+            clusters.append(cluster)
+        return clusters
+
+    def canonicalize(self, texts: Sequence[str]) -> Tuple[List[str], List[int]]:
+        """(each text's representative text, each text's cluster id); also records the rows and texts folded away."""
+        texts = list(texts)
+        clusters = self.assign(texts)
+        canonical = [self._representatives[cluster][0] if cluster in self._representatives else text
+                     for text, cluster in zip(texts, clusters)]
+        self.rows += len(texts)
+        for text, representative, cluster in zip(texts, canonical, clusters):
+            if text == representative:
+                continue
+            self.near_duplicate_rows += 1
+            members = self._folded.setdefault(cluster, set())
+            key = zlib.crc32(text.encode('utf-8')) if isinstance(text, str) else 0
+            if key not in members:
+                members.add(key)
+                self.folded_texts += 1
+        return canonical, clusters
+
+    def clear(self) -> None:
+        for bucket in self._buckets:
+            bucket.clear()
+        self._representatives.clear()
+        self._folded.clear()
+
+    def report(self) -> Dict[str, Any]:
+        """Rows and distinct texts that took a representative's result instead of being scored."""
+        return {
+            'threshold': self.threshold,
+            'rows': self.rows,
+            'clusters': self._next_cluster,
+            'near_duplicate_rows': self.near_duplicate_rows,
+            'near_duplicate_share': self.near_duplicate_rows / self.rows if self.rows else 0.0,
+            'texts_not_scored': self.folded_texts,
+        }
+
+    def format_report(self) -> str:
+        report = self.report()
+        return (f"Near-duplicates (threshold {report['threshold']}): {report['near_duplicate_rows']} of "
+                f"{report['rows']} rows ({report['near_duplicate_share']:.1%}) reused their cluster "
+                f"representative's result; {report['texts_not_scored']} distinct texts were not scored "
+                f"({report['clusters']} clusters)")
+
+    def _shingle_hashes(self, text: str) -> List[int]:
+        if not isinstance(text, str):
+            text = ''
+        if self.mask_digits:
+            text = _DIGITS.sub('0', text)
+        words = text.split()
+        size = self.shingle_size
+        shingles = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)] or [' '.join(words)]
+        return [zlib.crc32(shingle.encode('utf-8')) % _PRIME for shingle in shingles]
+
+    def _match(self, signature, keys: List[bytes]):
+        checked = set()
+        for bucket, key in zip(self._buckets, keys):
+            cluster = bucket.get(key)
+            if cluster is None or cluster in checked or cluster not in self._representatives:
+                continue
+            checked.add(cluster)
+            if (self._representatives[cluster][1] == signature).mean() >= self.threshold:
+                return cluster
+        return None
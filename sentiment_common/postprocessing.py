@@ -0,0 +1,83 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .backends import softmax
+
+
+def map_labels(labels, mapping: Callable[[str], str]):
+    """Applies mapping to an array of labels, calling it once per distinct label rather than once per row."""
+    import numpy as np
+
+    labels = np.asarray(labels, dtype=object)
+    if labels.size == 0:
+        return labels
+    distinct, inverse = np.unique(labels, return_inverse=True)
+    return np.array([mapping(label) for label in distinct.tolist()], dtype=object)[inverse.reshape(labels.shape)]
+
+
+def apply_neutral_band(sentiments, scores, band: Optional[Tuple[float, float]]):
+    """sentiments with every row whose score lies inside band (inclusive) replaced by 'neutral'."""
+    import numpy as np
+
+    if band is None:
+        return sentiments
+    low, high = band
+    scores = np.asarray(scores)
+    return np.where((scores >= low) & (scores <= high), 'neutral', sentiments).astype(object)
+
+
+class ScoredBatch:
+    """The top label and its score for each row of a batch, held as two numpy arrays.
+
+    This is what the batch paths pass around instead of a list of
+    {'label': ..., 'score': ...} dicts: building it from the model's probability (or
+    logit) matrix is one argmax and one gather, and ModelSpec.sentiments() turns it
+    into sentiments without touching the rows one by one. results() gives the dicts
+    for the places that store or compare single rows (the result cache, the cascade).
+    """
+
+    def __init__(self, labels, scores):
+        import numpy as np
+
+        self.labels = np.asarray(labels, dtype=object)
+        self.scores = np.asarray(scores, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def from_probabilities(cls, probabilities, id2label: Dict[int, str]) -> 'ScoredBatch':
+        import numpy as np
+
+        probabilities = np.asarray(probabilities)
+        if probabilities.size == 0:
+            return cls([], [])
+        best = probabilities.argmax(axis=-1)
+        # One entry per label; indexing it with the argmax labels the whole batch at once
+        names = np.array([id2label[index] for index in range(probabilities.shape[-1])], dtype=object)
+        return cls(names[best], np.take_along_axis(probabilities, best[:, None], axis=-1)[:, 0])
+
+    @classmethod
+    def from_logits(cls, logits, id2label: Dict[int, str]) -> 'ScoredBatch':
+        import numpy as np
+
+        return cls.from_probabilities(softmax(np.asarray(logits, dtype=np.float64)), id2label)
+
+    @classmethod
+    def from_results(cls, results: Sequence[Dict[str, Any]]) -> 'ScoredBatch':
+        return cls([result['label'] for result in results], [result['score'] for result in results])
+
+    @classmethod
+    def concatenate(cls, batches: Sequence['ScoredBatch']) -> 'ScoredBatch':
+        import numpy as np
+
+        return cls(np.concatenate([batch.labels for batch in batches]),
+                   np.concatenate([batch.scores for batch in batches]))
+
+    def take(self, indices: Sequence[int]) -> 'ScoredBatch':
+        import numpy as np
+
+        indices = np.asarray(indices, dtype=np.int64)
+        return ScoredBatch(self.labels[indices], self.scores[indices])
+
+    def results(self) -> List[Dict[str, Any]]:
+        return [{'label': label, 'score': score} for label, score in zip(self.labels.tolist(), self.scores.tolist())]
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+
+def count_items(result: Any) -> int:
+    """Items in a stage's output: its length when it has one (lists, Series, DataFrames), else 1."""
+    return len(result) if hasattr(result, '__len__') else 1
+
+
+class StageProfiler:
+    """Accumulates wall time, CPU time, call count and item count per named stage.
+
+    Stages are timed with the stage() context manager, by wrapping a callable with
+    wrap(), or by iterating through timed_iter(). CPU time is process time, so it
+    includes other threads of this process but not worker processes. Several threads
+    may record into the same profiler.
+    """
+
+    def __init__(self):
+        self.stages: 'OrderedDict[str, Dict[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, items, time.process_time() - cpu_start)
+
+    def add(self, name: str, seconds: float, items: int = 0, cpu_seconds: float = 0.0) -> None:
+        with self._lock:
+            stats = self.stages.setdefault(name, {'seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0, 'items': 0})
+            stats['seconds'] += seconds
+            stats['cpu_seconds'] += cpu_seconds
+            stats['calls'] += 1
+            stats['items'] += items
+
+    def wrap(self, name: str, fn: Callable, count: Optional[Callable[[Any], int]] = None) -> Callable:
+        """Returns fn timed under name; count(result) gives the items handled (default: count_items)."""
+        count = count or count_items
+
+        def timed(*args, **kwargs):
+            start, cpu_start = time.perf_counter(), time.process_time()
+            result = fn(*args, **kwargs)
+            self.add(name, time.perf_counter() - start, count(result), time.process_time() - cpu_start)
+            return result
+        return timed
+
+    def timed_iter(self, name: str, iterable: Iterable, count: Optional[Callable[[Any], int]] = None) -> Iterator:
+        """Yields from iterable, timing each step under name (e.g. a chunked CSV reader)."""
+        count = count or count_items
+        iterator = iter(iterable)
+        while True:
+            start, cpu_start = time.perf_counter(), time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(name, time.perf_counter() - start, count(item), time.process_time() - cpu_start)
+            yield item
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: dict(stats, items_per_sec=stats['items'] / stats['seconds'] if stats['seconds'] > 0 else 0.0)
+                for name, stats in self.stages.items()
+            }
@@ -0,0 +1,250 @@
+import json
+import os
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# File extension -> input format. Everything but CSV is read with pyarrow.
+INPUT_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+
+def input_format(file_path: str) -> str:
+    """Returns 'csv', 'parquet', 'arrow' (Arrow IPC file or stream) or 'jsonl', from the file extension."""
+    extension = os.path.splitext(str(file_path))[1].lower()
+    try:
+        return INPUT_FORMATS[extension]
+    except KeyError:
+        raise ValueError(f"Unsupported input file type {extension!r} for {file_path} "
+                         f"(expected one of {', '.join(sorted(INPUT_FORMATS))})") from None
+
+
+def read_record_batches(file_path: str, columns: Sequence[str], batch_size: int = 10_000, skip_rows: int = 0,
+                        optional_columns: Sequence[str] = ()) -> Iterator['pa.RecordBatch']:
+    """Yields a Parquet, Arrow IPC or JSONL file as pyarrow RecordBatches of at most batch_size rows.
+
+    Only columns (which must exist) and those optional_columns the file has are read,
+    in file order; a wide export's other columns are never decoded. Parquet pages are
+    decoded per batch, and row groups that lie wholly within the first skip_rows rows
+    are not read at all. Arrow files are memory-mapped, so column selection and
+    slicing are zero-copy views of the file. JSONL has no columnar layout; it is
+    parsed line by line, keeping only the wanted fields.
+    """
+    fmt = input_format(file_path)
+    if fmt == 'csv':
+        raise ValueError(f"{file_path}: CSV input is read with pandas, not read_record_batches()")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"Reading {fmt} input needs pyarrow (pip install pyarrow)") from None
+
+    if fmt == 'parquet':
+        batches, skipped = _parquet_batches(file_path, columns, optional_columns, batch_size, skip_rows)
+    elif fmt == 'arrow':
+        batches, skipped = _arrow_batches(file_path, columns, optional_columns), 0
+    else:
+        batches, skipped = _jsonl_batches(file_path, columns, optional_columns, batch_size), 0
+    skip_rows -= skipped
+    try:
+        for batch in batches:
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            batch, skip_rows = batch.slice(skip_rows), 0
+            # Files are written with whatever batch sizes their producer chose; re-slice (zero-copy) to ours
+            for start in range(0, batch.num_rows, batch_size):
+                yield batch.slice(start, batch_size)
+    finally:
+        batches.close()
+
+
+def _select_columns(file_path: str, names: Sequence[str], columns: Sequence[str],
+                    optional_columns: Sequence[str]) -> List[str]:
+    for column in columns:
+        if column not in names:
+            raise ValueError(f"{file_path} must contain a '{column}' column.")
+    wanted = set(columns) | set(optional_columns)
+    return [name for name in names if name in wanted]
+
+
+def _parquet_batches(file_path, columns, optional_columns, batch_size, skip_rows):
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(file_path, memory_map=True)
+    selected = _select_columns(file_path, parquet.schema_arrow.names, columns, optional_columns)
+    row_groups, skipped = [], 0
+    for index in range(parquet.num_row_groups):
+        rows = parquet.metadata.row_group(index).num_rows
+        if not row_groups and skipped + rows <= skip_rows:
+            skipped += rows
+            continue
+        row_groups.append(index)
+
+    def batches():
+        try:
+            if row_groups:
+                yield from parquet.iter_batches(batch_size=batch_size, row_groups=row_groups, columns=selected)
+        finally:
+            parquet.close()
+    return batches(), skipped
+
+
+def _arrow_batches(file_path, columns, optional_columns):
+    import pyarrow as pa
+
+    source = pa.memory_map(str(file_path))
+    try:
+        try:
+            reader = pa.ipc.open_file(source)
+            schema, batches = reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            # Not the random-access file format; try the streaming format
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+            schema, batches = reader.schema, iter(reader)
+        selected = _select_columns(file_path, schema.names, columns, optional_columns)
+    except Exception:
+        source.close()
+        raise
+
+    def projected():
+        try:
+            for batch in batches:
+                yield pa.RecordBatch.from_arrays([batch.column(name) for name in selected], names=selected)
+        finally:
+            source.close()
+    return projected()
+
+
+def _jsonl_batches(file_path, columns, optional_columns, batch_size):
+    import pyarrow as pa
+
+    selected = None
+    rows: List[Dict[str, Any]] = []
+    with open(file_path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if selected is None:
+                # The first record decides which optional columns the file has
+                selected = _select_columns(file_path, list(record), columns, optional_columns)
+            rows.append(record)
+            if len(rows) == batch_size:
+                yield pa.RecordBatch.from_pydict({name: [row.get(name) for row in rows] for name in selected})
+                rows = []
+    if rows:
+        yield pa.RecordBatch.from_pydict({name: [row.get(name) for row in rows] for name in selected})
+
+
+def iter_input_rows(file_path: str, text_column: str = 'text', id_column: Optional[str] = 'id',
+                    chunksize: int = 10_000) -> Iterator[Dict[str, Any]]:
+    """Yields {id_column: ..., text_column: ...} dicts for each input row, in any INPUT_FORMATS format.
+
+    Only the text column and, when the file has one, the id column are read; CSV
+    chunks are parsed by pandas, the other formats by read_record_batches().
+    """
+    optional = [id_column] if id_column else []
+    if input_format(file_path) == 'csv':
+        import pandas as pd
+
+        header = pd.read_csv(file_path, nrows=0)
+        selected = _select_columns(file_path, list(header.columns), [text_column], optional)
+        with pd.read_csv(file_path, usecols=selected, chunksize=chunksize) as chunks:
+            for chunk in chunks:
+                yield from chunk.to_dict('records')
+        return
+    for batch in read_record_batches(file_path, [text_column], chunksize, optional_columns=optional):
+        yield from batch.to_pylist()
+
+
+class TextStreamReader:
+    """Streams rows of a text column in fixed-size chunks behind a cursor.
+
+    Only one chunk is held in memory at a time, so memory stays flat no matter
+    how large the input file is. preprocess is called once per chunk with the
+    chunk's texts and must return the processed texts in the same order.
+
+    CSV is read with pandas, parsing only the text column. Parquet, Arrow IPC and
+    JSONL files (picked by extension, see INPUT_FORMATS) are read as record batches
+    holding just the text column, so wide exports never decode their other columns.
+    """
+
+    def __init__(self, file_path: str, preprocess: Callable[[List[str]], List[str]],
+                 chunksize: int = 10_000, text_column: str = 'text', skip_rows: int = 0):
+        self.file_path = file_path
+        self.preprocess = preprocess
+        self.text_column = text_column
+        self.position = skip_rows  # Input row index of the next row handed out
+        self._to_skip = skip_rows  # Leading rows dropped without preprocessing (e.g. when resuming)
+
+        if input_format(file_path) == 'csv':
+            import pandas as pd  # Imported here so entry points that only parse --help never pay for it
+
+            header = pd.read_csv(file_path, nrows=0)
+            if text_column not in header.columns:
+                raise ValueError(f"CSV file must contain a '{text_column}' column.")
+
+            self._source = pd.read_csv(file_path, usecols=[text_column], chunksize=chunksize)
+            self._chunks = (chunk[text_column].tolist() for chunk in self._source)
+        else:
+            # read_record_batches skips the leading rows itself, without decoding whole skipped row groups
+            self._source = read_record_batches(file_path, [text_column], chunksize, skip_rows)
+            self._chunks = (batch.column(0).to_pylist() for batch in self._source)
+            self._to_skip = 0
+        self._texts: List[str] = []
+        self._processed: List[str] = []
+        self._cursor = 0
+
+    def next_row(self) -> Optional[Tuple[str, str]]:
+        """Returns the next (text, processed_text) pair, or None once the file is exhausted."""
+        if self._cursor >= len(self._texts) and not self._load_next_chunk():
+            return None
+        row = (self._texts[self._cursor], self._processed[self._cursor])
+        self._cursor += 1
+        self.position += 1
+        return row
+
+    def next_rows(self, n: int) -> List[Tuple[str, str]]:
+        """Returns up to n (text, processed_text) pairs; fewer only at the end of the file."""
+        rows = []
+        while len(rows) < n:
+            if self._cursor >= len(self._texts) and not self._load_next_chunk():
+                break
+            end = min(len(self._texts), self._cursor + n - len(rows))
+            rows.extend(zip(self._texts[self._cursor:end], self._processed[self._cursor:end]))
+            self.position += end - self._cursor
+            self._cursor = end
+        return rows
+
+    def close(self) -> None:
+        self._source.close()
+
+    def _load_next_chunk(self) -> bool:
+        texts = next(self._chunks, None)
+        while texts is not None:
+            if self._to_skip:
+                skipped = min(self._to_skip, len(texts))
+                texts = texts[skipped:]
+                self._to_skip -= skipped
+            if texts:
+                self._processed = self.preprocess(texts)
+                self._texts = texts
+                self._cursor = 0
+                return True
+            texts = next(self._chunks, None)
+        self._texts, self._processed, self._cursor = [], [], 0
+        return False
+
+
+# Older name, from when only CSV was supported
+CsvStreamReader = TextStreamReader
@@ -0,0 +1,137 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .backends import OnnxSentimentClassifier, StubSentimentClassifier, load_backend_pipeline
+from .postprocessing import apply_neutral_band, map_labels
+
+TWITTER_ROBERTA = "cardiffnlp/twitter-roberta-base-sentiment"
+TWITTER_ROBERTA_LATEST = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+MULTILINGUAL_STARS = "nlptown/bert-base-multilingual-uncased-sentiment"
+
+
+class ModelSpec:
+    """What the pipelines need to know about a sentiment model besides its weights.
+
+    labels maps the model's raw labels to sentiments, in the model's label order, so
+    a generic LABEL_<i> (as the stub backend, or a checkpoint without id2label, gives)
+    means the i-th entry. With neutral_band=(low, high), a top score inside the band
+    reads as 'neutral' whatever the label, for models that have no neutral class or
+    when a low-confidence call should count as neutral.
+    """
+
+    def __init__(self, model_id: str, labels: Dict[str, str], neutral_band: Optional[Tuple[float, float]] = None):
+        self.model_id = model_id
+        self.labels = labels
+        self.neutral_band = neutral_band
+        self._by_index = {f"LABEL_{index}": sentiment for index, sentiment in enumerate(labels.values())}
+
+    def label(self, raw_label: str) -> str:
+        """The sentiment for a raw model label; labels the spec doesn't know are returned as is."""
+        return self.labels.get(raw_label) or self._by_index.get(raw_label, raw_label)
+
+    def raw_label(self, sentiment: str) -> str:
+        """The model's own label for sentiment (the first one declared for it)."""
+        for raw_label, mapped in self.labels.items():
+            if mapped == sentiment:
+                return raw_label
+        raise KeyError(f"{self.model_id} has no label for {sentiment!r}")
+
+    def sentiment(self, result: Dict[str, Any], neutral_band: bool = True) -> str:
+        """The sentiment for a pipeline result ({'label': ..., 'score': ...}), applying the neutral band if declared."""
+        if neutral_band and self.neutral_band is not None:
+            low, high = self.neutral_band
+            if low <= result['score'] <= high:
+                return 'neutral'
+        return self.label(result['label'])
+
+    def sentiments(self, batch, neutral_band: bool = True):
+        """sentiment() for a whole postprocessing.ScoredBatch at once; returns an array of sentiments."""
+        sentiments = map_labels(batch.labels, self.label)
+        return apply_neutral_band(sentiments, batch.scores, self.neutral_band if neutral_band else None)
+
+
+MODELS: Dict[str, ModelSpec] = {spec.model_id: spec for spec in (
+    # Its config only has generic label names; a top score of 0.40-0.60 is treated as too unsure to call
+    ModelSpec(TWITTER_ROBERTA, {'LABEL_0': 'negative', 'LABEL_1': 'neutral', 'LABEL_2': 'positive'},
+              neutral_band=(0.40, 0.60)),
+    ModelSpec(TWITTER_ROBERTA_LATEST, {'negative': 'negative', 'neutral': 'neutral', 'positive': 'positive'}),
+    # Ratings rather than polarities
+    ModelSpec(MULTILINGUAL_STARS, {'1 star': 'very negative', '2 stars': 'negative', '3 stars': 'neutral',
+                                   '4 stars': 'positive', '5 stars': 'very positive'}),
+)}
+
+
+def model_spec(model_id: str) -> ModelSpec:
+    """The declared spec for model_id; an undeclared model gets one that passes its labels through unchanged."""
+    spec = MODELS.get(model_id)
+    return spec if spec is not None else ModelSpec(model_id, {})
+
+
+class ModelRegistry:
+    """Loads each model at most once per process and hands out shared references to it.
+
+    get() returns the same classifier to every caller asking for the same model,
+    backend and options, loading it on the first request only (concurrent first
+    requests wait for that one load). Asking for different call options on an
+    already loaded model builds a new classifier around the same weights and
+    tokenizer, not a second copy of them.
+    """
+
+    def __init__(self):
+        self._classifiers: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+
+    def get(self, model_id: str, backend: str = 'torch', **pipeline_kwargs) -> Any:
+        key = (model_id, backend, tuple(sorted(pipeline_kwargs.items())))
+        classifier = self._classifiers.get(key)
+        if classifier is not None:
+            return classifier
+        with self._lock:
+            load_lock = self._load_locks.setdefault((model_id, backend), threading.Lock())
+        # One lock per model and backend: other models load in parallel, this one only once
+        with load_lock:
+            classifier = self._classifiers.get(key)
+            if classifier is None:
+                base = next((loaded for (loaded_id, loaded_backend, _), loaded in self._classifiers.items()
+                             if (loaded_id, loaded_backend) == (model_id, backend)), None)
+                if base is not None:
+                    classifier = _same_weights(base, pipeline_kwargs)
+                else:
+                    classifier = load_backend_pipeline(model_id, backend, **pipeline_kwargs)
+                with self._lock:
+                    self._classifiers[key] = classifier
+        return classifier
+
+    def loaded(self) -> Dict[str, int]:
+        """Classifiers held per model@backend."""
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for model_id, backend, _ in self._classifiers:
+                name = f"{model_id}@{backend}"
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def clear(self) -> None:
+        """Drops every shared reference, so the models can be freed once their other users let go."""
+        with self._lock:
+            self._classifiers.clear()
+
+
+def _same_weights(base: Any, pipeline_kwargs: Dict[str, Any]) -> Any:
+    if isinstance(base, OnnxSentimentClassifier):
+        return OnnxSentimentClassifier(base.session, base.tokenizer, base.id2label, **pipeline_kwargs)
+    if isinstance(base, StubSentimentClassifier):
+        return StubSentimentClassifier(**pipeline_kwargs)
+    from transformers import pipeline
+
+    return pipeline("sentiment-analysis", model=base.model, tokenizer=base.tokenizer, **pipeline_kwargs)
+
+
+# Process-wide registry shared by every pipeline and processor
+registry = ModelRegistry()
+
+
+def shared_pipeline(model_id: str, backend: str = 'torch', **pipeline_kwargs) -> Any:
+    """registry.get() as a module-level function, so functools.partial of it can be sent to process pools."""
+    return registry.get(model_id, backend, **pipeline_kwargs)
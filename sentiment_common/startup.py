@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+
+class StartupTimer:
+    """Collects how long each startup phase took (imports, tokenizer load, weight load, first inference)."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def time_once(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        """Calls fn, timing it under name only the first time name is seen (e.g. first inference)."""
+        if name in self.phases:
+            return fn(*args, **kwargs)
+        with self.phase(name):
+            return fn(*args, **kwargs)
+
+    def report(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.phases)
+
+    def format_report(self) -> str:
+        phases = self.report()
+        lines = [f"  {name:<16}{seconds:8.3f}s" for name, seconds in phases.items()]
+        lines.append(f"  {'total':<16}{sum(phases.values()):8.3f}s")
+        return "Startup time breakdown:\n" + "\n".join(lines)
+
+
+# Process-wide timer shared by everything that loads a model
+startup_timer = StartupTimer()
+
+
+def load_sentiment_pipeline(model_name: str, **pipeline_kwargs):
+    """Builds a transformers sentiment-analysis pipeline, importing transformers only now.
+
+    Equivalent to pipeline("sentiment-analysis", model=model_name), with the import,
+    tokenizer load and weight load timed separately on startup_timer.
+    """
+    with startup_timer.phase("imports"):
+        import torch  # noqa: F401  (timed here so the weight load below doesn't absorb it)
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    with startup_timer.phase("tokenizer load"):
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    with startup_timer.phase("weight load"):
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, **pipeline_kwargs)
+
+
+class ModelLoadError(RuntimeError):
+    """An AttributeError raised while a LazyModel was building its model."""
+
+
+class LazyModel:
+    """Stands in for a model and builds it with factory() the first time it is needed.
+
+    Calling it runs the model (the first call is timed as 'first inference'); other
+    attributes, such as tokenizer, are looked up on the built model. Until it is built
+    the wrapper is picklable whenever factory is, so it can be handed to process pools.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        self._model = self.factory()
+                    except AttributeError as e:
+                        # Escaping a property, it would make Python fall back to __getattr__ and
+                        # report a missing attribute on this wrapper instead of the real failure
+                        raise ModelLoadError(f"loading the model failed: {e!r}") from e
+        return self._model
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return startup_timer.time_once("first inference", self.model, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or name in ('factory', 'model'):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __getstate__(self):
+        return {'factory': self.factory}
+
+    def __setstate__(self, state):
+        self.__init__(state['factory'])
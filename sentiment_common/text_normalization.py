@@ -0,0 +1,63 @@
+import re
+from typing import Iterable, List
+
+# A batch is joined into one string so the character filter runs once per batch
+# instead of once per row. U+001E (record separator) is whitespace for both
+# str.isspace and the regex \s class, so it survives every filter below and
+# splits the batch back into rows afterwards.
+_SEPARATOR = '\x1e'
+
+
+class TextNormalizer:
+    """Removes everything except ASCII letters, digits and whitespace, then lowercases.
+
+    With unicode_letters=True, letters and digits of any script are kept as well
+    (accents, Cyrillic, CJK...), for text going to a multilingual model. ASCII text
+    comes out the same either way.
+
+    normalize() handles one text; normalize_many() handles a whole column or list
+    in a single pass and returns exactly what normalize() would for each item.
+    """
+
+    def __init__(self, keep_apostrophes: bool = False, strip: bool = False,
+                 collapse_whitespace: bool = False, unicode_letters: bool = False):
+        allowed = "a-zA-Z0-9'" if keep_apostrophes else "a-zA-Z0-9"
+        self.strip = strip or collapse_whitespace
+        self.collapse_whitespace = collapse_whitespace
+        if unicode_letters:
+            # \w also matches '_', which the ASCII character class never kept
+            allowed = r"\w'" if keep_apostrophes else r"\w"
+            self._pattern = re.compile(rf"[^{allowed}\s]|_")
+        else:
+            self._pattern = re.compile(rf"[^{allowed}\s]")
+        # ASCII-only batches go through bytes.translate, which is much faster than re.sub
+        self._ascii_delete = bytes(c for c in range(128) if self._pattern.match(chr(c)))
+
+    def normalize(self, text: str) -> str:
+        text = self._pattern.sub('', text).lower()
+        return self._finish(text)
+
+    def normalize_many(self, texts: Iterable[str]) -> List[str]:
+        texts = texts.tolist() if hasattr(texts, 'tolist') else list(texts)
+        if not texts:
+            return []
+
+        joined = _SEPARATOR.join(texts)
+        if joined.count(_SEPARATOR) != len(texts) - 1:
+            # The separator occurs inside the data itself, so it can't mark row boundaries
+            return [self.normalize(text) for text in texts]
+
+        if joined.isascii():
+            cleaned = joined.encode('ascii').translate(None, self._ascii_delete).decode('ascii')
+        else:
+            cleaned = self._pattern.sub('', joined)
+        return [self._finish(text) for text in cleaned.lower().split(_SEPARATOR)]
+
+    def _finish(self, text: str) -> str:
+        # str.split() and the regex \s class agree on what counts as whitespace,
+        # so this matches re.sub(r'\s+', ' ', text.strip())
+        if self.collapse_whitespace:
+            return ' '.join(text.split())
+        if self.strip:
+            return text.strip()
+        return text
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import shutil
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class TokenCache:
+    """A dataset tokenized once and stored as flat, memory-mapped numpy arrays.
+
+    Row i's tokens are input_ids[offsets[i]:offsets[i + 1]] (attention_mask likewise),
+    with no padding stored. Opening a cache only maps the files, so load time is near
+    zero whatever the dataset size; batch() pads just the rows it is asked for.
+    """
+
+    def __init__(self, directory: str):
+        import numpy as np
+
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        self.input_ids = self._map('input_ids.bin', np.int32)
+        self.attention_mask = self._map('attention_mask.bin', np.uint8)
+        self.pad_token_id = self.meta['pad_token_id']
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def lengths(self, rows: Sequence[int]) -> List[int]:
+        import numpy as np
+
+        rows = np.asarray(rows, dtype=np.int64)
+        return (self.offsets[rows + 1] - self.offsets[rows]).tolist()
+
+    def batch(self, rows: Sequence[int]) -> Tuple[Any, Any]:
+        """Returns (input_ids, attention_mask) for rows as padded int64 arrays, ready for the model."""
+        import numpy as np
+
+        lengths = self.lengths(rows)
+        width = max(lengths, default=0)
+        input_ids = np.full((len(lengths), width), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(lengths), width), dtype=np.int64)
+        for i, (row, length) in enumerate(zip(rows, lengths)):
+            start = self.offsets[row]
+            input_ids[i, :length] = self.input_ids[start:start + length]
+            attention_mask[i, :length] = self.attention_mask[start:start + length]
+        return input_ids, attention_mask
+
+    def _map(self, name: str, dtype):
+        import numpy as np
+
+        path = os.path.join(self.directory, name)
+        # np.memmap can't map an empty file
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    @classmethod
+    def build(cls, directory: str, text_chunks: Iterable[List[str]], tokenizer, meta: Dict[str, Any],
+              max_length: Optional[int] = None) -> 'TokenCache':
+        """Tokenizes text_chunks (lists of already preprocessed texts) into a new cache at directory.
+
+        Texts are truncated to max_length tokens (default: the tokenizer's model limit).
+
+        Chunks are appended to the files as they are tokenized, so memory holds one chunk
+        at a time. The cache is built under a temporary name and renamed when complete.
+        """
+        import numpy as np
+
+        building = directory + '.building'
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+        offsets = [0]
+        with open(os.path.join(building, 'input_ids.bin'), 'wb') as ids_file, \
+                open(os.path.join(building, 'attention_mask.bin'), 'wb') as mask_file:
+            for texts in text_chunks:
+                if not texts:
+                    continue
+                encoded = tokenizer(list(texts), truncation=True, max_length=max_length)
+                lengths = [len(ids) for ids in encoded['input_ids']]
+                total = sum(lengths)
+                ids_file.write(np.fromiter(chain.from_iterable(encoded['input_ids']), np.int32, total).tobytes())
+                if 'attention_mask' in encoded:
+                    mask = np.fromiter(chain.from_iterable(encoded['attention_mask']), np.uint8, total)
+                else:
+                    mask = np.ones(total, dtype=np.uint8)
+                mask_file.write(mask.tobytes())
+                for length in lengths:
+                    offsets.append(offsets[-1] + length)
+        np.save(os.path.join(building, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+        pad_token_id = getattr(tokenizer, 'pad_token_id', None)
+        meta = dict(meta, rows=len(offsets) - 1, tokens=offsets[-1],
+                    pad_token_id=pad_token_id if pad_token_id is not None else 0)
+        with open(os.path.join(building, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(building, directory)
+        return cls(directory)
+
+
+def token_cache_key(source_path: str, tokenizer_id: str, preprocessing_version: Any,
+                    max_length: Optional[int] = None) -> Dict[str, Any]:
+    """What a cache must match to be reused: the tokenizer and its length cap, the preprocessing and the exact source file."""
+    stat = os.stat(source_path)
+    return {
+        'tokenizer_id': tokenizer_id,
+        'max_length': max_length,
+        'preprocessing_version': preprocessing_version,
+        'source': {'path': os.path.abspath(source_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+    }
+
+
+def open_token_cache(root: str, source_path: str, tokenizer_id: str, preprocessing_version: Any,
+                     text_chunks: Callable[[], Iterable[List[str]]], tokenizer: Callable[[], Any],
+                     max_length: Optional[int] = None) -> TokenCache:
+    """Opens the cache for source_path under root, building it first if there is none yet.
+
+    The cache directory is named after a hash of token_cache_key(), so changing the
+    tokenizer, bumping the preprocessing version or editing the source file gives a
+    fresh cache. text_chunks() and tokenizer() are only called when building.
+    """
+    key = token_cache_key(source_path, tokenizer_id, preprocessing_version, max_length)
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    directory = os.path.join(root, f"{os.path.splitext(os.path.basename(source_path))[0]}-{digest}")
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        return TokenCache(directory)
+    os.makedirs(root, exist_ok=True)
+    return TokenCache.build(directory, text_chunks(), tokenizer(), key, max_length)
@@ -0,0 +1,247 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .backends import BACKENDS, backend_model_id
+from .registry import TWITTER_ROBERTA, TWITTER_ROBERTA_LATEST, shared_pipeline
+from .windowing import WindowedClassifier
+
+# Tuned profiles are kept per host under here (SENTIMENT_TUNING_DIR overrides it)
+DEFAULT_TUNING_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sentiment-pipelines', 'tuned')
+# What a profile sets; entry points fall back to their own defaults for anything missing
+TUNED_SETTINGS = ('workers', 'threads_per_worker', 'max_batch_tokens')
+DEFAULT_BATCH_TOKENS = (1024, 2048, 4096, 8192, 16384)
+# TextNormalizer options of the entry point each model is tuned for, so the sample has that run's token
+# lengths: final.py's normalizer for its model, Self-pipeline-hugginface's preprocessor for everything else
+NORMALIZER_OPTIONS = {TWITTER_ROBERTA: {}}
+DEFAULT_NORMALIZER_OPTIONS = {'keep_apostrophes': True, 'strip': True, 'collapse_whitespace': True}
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (its affinity mask where the OS has one, e.g. inside a container)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def host_fingerprint() -> Dict[str, Any]:
+    return {'hostname': socket.gethostname(), 'cpus': available_cpus(), 'machine': platform.machine(),
+            'processor': platform.processor()}
+
+
+def profile_path(directory: Optional[str] = None) -> str:
+    directory = directory or os.environ.get('SENTIMENT_TUNING_DIR') or DEFAULT_TUNING_DIR
+    return os.path.join(directory, f"{socket.gethostname()}.json")
+
+
+def set_torch_threads(threads: Optional[int]) -> None:
+    """torch.set_num_threads(threads), when threads is given and torch is installed (the stub backend needs neither)."""
+    if not threads:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def load_tuned_settings(model_name: str, backend: str = 'torch',
+                        directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The tuned settings for model_name and backend on this host, or None when it was never tuned.
+
+    A profile written on a host with a different number of CPUs (a resized VM, another
+    container limit) is ignored rather than applied.
+    """
+    path = profile_path(directory)
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get('host', {}).get('cpus') != available_cpus():
+        return None
+    entry = profile.get('models', {}).get(backend_model_id(model_name, backend))
+    if entry is None:
+        return None
+    return dict(entry['settings'], profile_path=path)
+
+
+def resolve_settings(explicit: Dict[str, Any], tuned: Optional[Dict[str, Any]],
+                     defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Per setting: the value given explicitly (not None), else the tuned one, else the default."""
+    resolved = {}
+    for name, default in defaults.items():
+        value = explicit.get(name)
+        if value is None and tuned is not None:
+            value = tuned.get(name)
+        resolved[name] = default if value is None else value
+    return resolved
+
+
+def describe_tuned(tuned: Dict[str, Any], applied: Iterable[str] = TUNED_SETTINGS) -> str:
+    settings = ', '.join(f"{name}={tuned[name]}" for name in applied if name in tuned)
+    return f"Using tuned settings from {tuned['profile_path']}: {settings}"
+
+
+def save_tuned_settings(model_name: str, backend: str, result: Dict[str, Any],
+                        directory: Optional[str] = None) -> str:
+    """Adds (or replaces) the entry for model_name and backend in this host's profile; returns its path."""
+    path = profile_path(directory)
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        profile = {}
+    if profile.get('host', {}).get('cpus') != available_cpus():
+        # Entries tuned for another CPU count no longer apply
+        profile = {}
+    profile['host'] = host_fingerprint()
+    profile.setdefault('models', {})[backend_model_id(model_name, backend)] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(temporary, path)
+    return path
+
+
+def candidate_layouts(cpus: int) -> List[Dict[str, int]]:
+    """(workers, threads per worker) pairs to try: powers of two up to cpus workers, each using all or half the CPUs."""
+    layouts = []
+    workers = 1
+    while workers <= cpus:
+        for threads in sorted({max(1, cpus // workers), max(1, cpus // workers // 2)}, reverse=True):
+            layouts.append({'workers': workers, 'threads_per_worker': threads})
+        workers *= 2
+    return layouts
+
+
+# Classifier owned by a tuning worker process, built once by _init_tuning_worker
+_classifier = None
+
+
+def _init_tuning_worker(model_name: str, backend: str, threads: int, max_length: int) -> None:
+    global _classifier
+    set_torch_threads(threads)
+    _classifier = WindowedClassifier(shared_pipeline(model_name, backend), max_length)
+    _classifier.probabilities(["warm up"])  # Load and first-call costs stay out of the measurements
+
+
+def _time_shard(args) -> float:
+    texts, max_batch_tokens = args
+    _classifier.max_batch_tokens = max_batch_tokens
+    start = time.perf_counter()
+    _classifier.probabilities(texts)
+    return time.perf_counter() - start
+
+
+def _percentile(values: Sequence[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def autotune(model_name: str, texts: Sequence[str], backend: str = 'torch',
+             layouts: Optional[List[Dict[str, int]]] = None,
+             batch_tokens: Sequence[int] = DEFAULT_BATCH_TOKENS, shard_size: int = 256,
+             max_length: int = 512, max_p95_ms: Optional[float] = None, log=print) -> Dict[str, Any]:
+    """Times every layout x token budget on texts and returns the best one with all trials.
+
+    Each layout runs in a fresh pool of workers processes with threads_per_worker
+    torch threads each (the model loaded and warmed up before timing); the texts are
+    split into shard_size shards as Self-pipeline-hugginface's ShardedAnalyzer does.
+    Throughput is rows/sec over the whole sample, latency the time a worker takes per
+    shard. The best trial has the highest throughput among those whose p95 latency
+    is within max_p95_ms (any trial, when none is).
+    """
+    texts = list(texts)
+    layouts = layouts or candidate_layouts(available_cpus())
+    trials = []
+    for layout in layouts:
+        pool = ProcessPoolExecutor(max_workers=layout['workers'], initializer=_init_tuning_worker,
+                                   initargs=(model_name, backend, layout['threads_per_worker'], max_length))
+        try:
+            # Every worker loads the model before the first timed round
+            list(pool.map(_time_shard, [(["warm up"], batch_tokens[0])] * layout['workers']))
+            for max_batch_tokens in batch_tokens:
+                shards = [(texts[i:i + shard_size], max_batch_tokens) for i in range(0, len(texts), shard_size)]
+                start = time.perf_counter()
+                latencies = list(pool.map(_time_shard, shards))
+                elapsed = time.perf_counter() - start
+                trial = dict(layout, max_batch_tokens=max_batch_tokens, rows_per_second=len(texts) / elapsed,
+                             latency_ms={'p50': _percentile(latencies, 50) * 1000,
+                                         'p95': _percentile(latencies, 95) * 1000})
+                trials.append(trial)
+                log(f"workers {trial['workers']:>3}  threads {trial['threads_per_worker']:>3}  "
+                    f"batch tokens {max_batch_tokens:>6}  {trial['rows_per_second']:>9.1f} rows/s  "
+                    f"p95 {trial['latency_ms']['p95']:>8.1f} ms/shard")
+        finally:
+            pool.shutdown()
+
+    eligible = [trial for trial in trials if max_p95_ms is None or trial['latency_ms']['p95'] <= max_p95_ms]
+    best = max(eligible or trials, key=lambda trial: trial['rows_per_second'])
+    return {
+        'settings': {name: best[name] for name in TUNED_SETTINGS},
+        'rows_per_second': best['rows_per_second'],
+        'latency_ms': best['latency_ms'],
+        'sample_rows': len(texts),
+        'shard_size': shard_size,
+        'max_p95_ms': max_p95_ms,
+        'tuned_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'trials': trials,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the fastest workers / torch threads / batch size for this host and save them as its "
+                    "tuned profile, which final.py and Self-pipeline-hugginface main.py then load by default")
+    parser.add_argument("input", help="input file (CSV, Parquet, Arrow IPC or JSONL) to take the sample from")
+    parser.add_argument("--model", action="append", default=None,
+                        help="model to tune (repeatable; default: the models final.py and the Self pipeline use)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--sample-rows", type=int, default=2000, help="texts taken from the top of the input")
+    parser.add_argument("--batch-tokens", type=int, nargs='+', default=list(DEFAULT_BATCH_TOKENS),
+                        help="padded-token budgets per model batch to try")
+    parser.add_argument("--max-workers", type=int, default=None, help="try at most this many worker processes")
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="only pick settings whose p95 latency per shard stays under this")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--tuning-dir", default=None,
+                        help=f"where profiles are kept (default {DEFAULT_TUNING_DIR}); pass the same "
+                             f"--tuning-dir to final.py and Self-pipeline-hugginface main.py")
+    args = parser.parse_args()
+
+    from .readers import iter_input_rows
+    from .text_normalization import TextNormalizer
+
+    raw_texts = []
+    for row in iter_input_rows(args.input, 'text', chunksize=args.sample_rows):
+        raw_texts.append(str(row['text']))
+        if len(raw_texts) >= args.sample_rows:
+            break
+    if not raw_texts:
+        parser.error(f"{args.input} has no rows to tune on")
+
+    layouts = candidate_layouts(available_cpus())
+    if args.max_workers is not None:
+        layouts = [layout for layout in layouts if layout['workers'] <= args.max_workers]
+    print(f"Tuning on {len(raw_texts)} texts, {available_cpus()} CPUs, backend {args.backend}")
+    for model_name in args.model or [TWITTER_ROBERTA, TWITTER_ROBERTA_LATEST]:
+        print(f"\n{model_name}")
+        normalizer = TextNormalizer(**NORMALIZER_OPTIONS.get(model_name, DEFAULT_NORMALIZER_OPTIONS))
+        texts = normalizer.normalize_many(raw_texts)
+        result = autotune(model_name, texts, args.backend, layouts, args.batch_tokens,
+                          max_length=args.max_length, max_p95_ms=args.max_p95_ms)
+        path = save_tuned_settings(model_name, args.backend, result, args.tuning_dir)
+        settings = ', '.join(f"{name}={value}" for name, value in result['settings'].items())
+        print(f"Best: {settings} ({result['rows_per_second']:.1f} rows/s); saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
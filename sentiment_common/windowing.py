@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .backends import token_probabilities
+from .batching import token_budget_batches
+from .postprocessing import ScoredBatch
+
+# How documents longer than max_length tokens are handled
+LONG_DOCUMENT_MODES = ('truncate', 'window')
+
+
+def window_spans(length: int, window: int, stride: int, max_windows: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(start, end) spans of at most window tokens, starting every stride tokens, that cover length tokens.
+
+    The last window ends at the last token. With max_windows, a document needing more
+    windows than that keeps max_windows of them spread evenly from first to last, so
+    the cost of any one document is capped at max_windows * window tokens.
+    """
+    if length <= window:
+        return [(0, length)]
+    starts = list(range(0, length - window, stride)) + [length - window]
+    if max_windows is not None and len(starts) > max_windows:
+        if max_windows == 1:
+            starts = starts[:1]
+        else:
+            last = len(starts) - 1
+            starts = [starts[round(i * last / (max_windows - 1))] for i in range(max_windows)]
+    return [(start, start + window) for start in starts]
+
+
+class WindowedClassifier:
+    """Classifies texts with a hard cap of max_length tokens per model input.
+
+    In 'truncate' mode a longer text is cut to its first max_length tokens. In
+    'window' mode it is split into overlapping windows of max_length tokens (each
+    starting stride tokens after the previous, at most max_windows of them) and its
+    result is the mean of its windows' label probabilities, weighted by window
+    length. Windows of all the texts in a call are batched together by token budget
+    (token_budget_batches()), so short inputs are never padded out to long ones.
+
+    pipe is a classifier from load_backend_pipeline() (or the model registry); texts
+    are tokenized once and the token ids fed straight to its model. Calling the
+    wrapper returns pipeline-shaped results; probabilities() returns the matrix and
+    scored() its top labels as a ScoredBatch.
+    """
+
+    def __init__(self, pipe, max_length: int = 512, mode: str = 'truncate', stride: Optional[int] = None,
+                 max_windows: Optional[int] = None, max_batch_tokens: int = 4096, max_batch_size: int = 64,
+                 return_all_scores: bool = False):
+        if mode not in LONG_DOCUMENT_MODES:
+            raise ValueError(f"Unknown long document mode: {mode!r} (expected one of {', '.join(LONG_DOCUMENT_MODES)})")
+        self.pipe = pipe
+        self.max_length = max_length
+        self.mode = mode
+        self.stride = stride
+        self.max_windows = max_windows
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.return_all_scores = return_all_scores
+
+    @property
+    def tokenizer(self):
+        return self.pipe.tokenizer
+
+    def __call__(self, inputs, **kwargs) -> List[Any]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        if not self.return_all_scores:
+            return self.scored(texts).results()
+        probabilities, id2label = self.probabilities(texts)
+        return [[{'label': id2label[index], 'score': score} for index, score in enumerate(row)]
+                for row in probabilities.tolist()]
+
+    def scored(self, texts: Sequence[str]) -> ScoredBatch:
+        """The top label and score per text, as arrays (no per-row results are built)."""
+        return ScoredBatch.from_probabilities(*self.probabilities(texts))
+
+    def probabilities(self, texts: Sequence[str]) -> Tuple[Any, Dict[int, str]]:
+        """Returns (a texts x labels probability matrix, the index-to-label mapping)."""
+        import numpy as np
+
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0)), {}
+        tokenizer = self.tokenizer
+        # Room left for <s>/</s> (or [CLS]/[SEP]) in each model input
+        content_length = max(1, self.max_length - tokenizer.num_special_tokens_to_add())
+        stride = self.stride or max(1, content_length // 2)
+
+        windows: List[List[int]] = []
+        owners: List[int] = []
+        weights: List[int] = []
+        for document, ids in enumerate(tokenizer(texts, add_special_tokens=False)['input_ids']):
+            if self.mode == 'truncate':
+                spans = [(0, min(len(ids), content_length))]
+            else:
+                spans = window_spans(len(ids), content_length, stride, self.max_windows)
+            for start, end in spans:
+                windows.append(tokenizer.build_inputs_with_special_tokens(ids[start:end]))
+                owners.append(document)
+                weights.append(max(end - start, 1))
+
+        pad_token_id = getattr(tokenizer, 'pad_token_id', None) or 0
+        window_probabilities = None
+        id2label: Dict[int, str] = {}
+        for batch in token_budget_batches([len(window) for window in windows], self.max_batch_tokens,
+                                          self.max_batch_size):
+            width = max(len(windows[i]) for i in batch)
+            input_ids = np.full((len(batch), width), pad_token_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, index in enumerate(batch):
+                input_ids[row, :len(windows[index])] = windows[index]
+                attention_mask[row, :len(windows[index])] = 1
+            probabilities, id2label = token_probabilities(self.pipe, input_ids, attention_mask)
+            if window_probabilities is None:
+                window_probabilities = np.empty((len(windows), probabilities.shape[1]))
+            window_probabilities[batch] = probabilities
+
+        if len(windows) == len(texts):
+            return window_probabilities, id2label
+        owners_array = np.asarray(owners)
+        weights_array = np.asarray(weights, dtype=np.float64)
+        documents = np.zeros((len(texts), window_probabilities.shape[1]))
+        np.add.at(documents, owners_array, window_probabilities * weights_array[:, None])
+        return documents / np.bincount(owners_array, weights_array)[:, None], id2label
@@ -0,0 +1,121 @@
+import csv
+import io
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class StreamingCsvWriter:
+    """Appends result rows to a CSV file in buffered chunks instead of collecting them all.
+
+    Rows are written to '<path>.part' whenever flush_rows rows are buffered or
+    flush_interval seconds have passed since the last flush. Each flush writes whole
+    rows and fsyncs, so the .part file is a valid CSV at any moment. close() writes
+    the remaining rows and atomically renames the .part file to path; abort() instead
+    deletes it, for callers that can't resume from it.
+
+    on_flush(writer) is called after every flush, e.g. to checkpoint rows_written and
+    bytes_written. Passing resume_rows/resume_bytes from such a checkpoint reopens an
+    existing .part file, drops anything past resume_bytes and keeps appending to it.
+    """
+
+    def __init__(self, path: str, fieldnames: Optional[List[str]] = None,
+                 flush_rows: int = 1000, flush_interval: float = 5.0,
+                 on_flush: Optional[Callable[['StreamingCsvWriter'], None]] = None,
+                 resume_rows: int = 0, resume_bytes: Optional[int] = None):
+        self.path = str(path)
+        self.part_path = self.path + '.part'
+        self.fieldnames = list(fieldnames) if fieldnames is not None else None
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.rows_written = resume_rows  # Rows that have reached the file
+        self.bytes_written = 0
+        self._buffer = io.StringIO()
+        self._buffered_rows = 0
+        self._writer = None
+        self._header_written = False
+        if resume_bytes is not None:
+            # Anything past the checkpointed position was written after the last checkpoint
+            os.truncate(self.part_path, resume_bytes)
+            self._file = open(self.part_path, 'a', newline='', encoding='utf-8')
+            self._header_written = resume_bytes > 0
+            self.bytes_written = resume_bytes
+        else:
+            self._file = open(self.part_path, 'w', newline='', encoding='utf-8')
+        self._last_flush = time.monotonic()
+        if self.fieldnames is not None:
+            self._start()
+
+    def write(self, row: Dict[str, Any]) -> None:
+        if self._writer is None:
+            # Without explicit fieldnames the first row decides the columns
+            self.fieldnames = list(row)
+            self._start()
+        self._writer.writerow(row)
+        self._buffered_rows += 1
+        if (self._buffered_rows >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def write_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def write_frame(self, df) -> None:
+        """Appends a pandas DataFrame's rows, formatted exactly as DataFrame.to_csv(index=False)."""
+        if self._writer is None:
+            self.fieldnames = [str(column) for column in df.columns]
+            self._start()
+        df.to_csv(self._buffer, header=False, index=False, lineterminator='\n')
+        self._buffered_rows += len(df)
+        if (self._buffered_rows >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        data = self._buffer.getvalue()
+        if data:
+            self._file.write(data)
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.rows_written += self._buffered_rows
+        self.bytes_written = os.fstat(self._file.fileno()).st_size
+        self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+        if self.on_flush is not None:
+            self.on_flush(self)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self) -> None:
+        """Discards the buffered rows and the .part file."""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the valid partial output under its .part name
+            self.flush()
+            self._file.close()
+
+    def _start(self) -> None:
+        # Same layout as DataFrame.to_csv(index=False): header row, minimal quoting, '\n' line endings
+        self._writer = csv.DictWriter(self._buffer, fieldnames=self.fieldnames, lineterminator='\n')
+        if not self._header_written:
+            self._writer.writeheader()
+            self._header_written = True